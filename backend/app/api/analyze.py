@@ -1,19 +1,366 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import asyncio
+import hashlib
+import json
 import os
+import threading
 import uuid
+from functools import partial
 from pathlib import Path
-from ..core.composition import CompositionAnalyzer
-from ..models.schemas import CompositionAnalysis, GenreType, RuleScore
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+from pydantic import BaseModel
+from ..core.admission import AdmissionRejected, admission, image_cost, image_size
+from ..core import composition
+from ..services.history_store import history_store
+from ..models.schemas import (
+    CompactCompositionAnalysis, CompositionAnalysis, GenreRecommendation, GenreType,
+    MultiGenreAnalysis, PreviewAnalysis, ResponseView, RuleScore
+)
 from ..core.config import settings
+from ..core.warmup import readiness
 
 router = APIRouter()
 
+# Metadata entries only returned with view=verbose
+VERBOSE_METADATA_KEYS = {"weights", "raw_results", "timings_ms"}
 
-@router.post("/analyze-composition", response_model=CompositionAnalysis)
+# Cancel events of in-progress streamed refinements, keyed by stream id
+refinements: Dict[str, threading.Event] = {}
+
+
+def validate_upload(file: UploadFile):
+    """Reject non-image uploads and disallowed extensions"""
+    if not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File must be an image")
+
+    file_ext = Path(file.filename).suffix.lower()
+    if file_ext not in settings.allowed_extensions:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File type {file_ext} not allowed. Allowed: {settings.allowed_extensions}"
+        )
+
+
+async def subject_spec(
+    subject_box: Optional[str],
+    subject_mask: Optional[UploadFile],
+    detect_subject: bool
+):
+    """Build the analyzer's subject request from form fields, or None"""
+    if not (subject_box or subject_mask or detect_subject):
+        return None
+    try:
+        return composition.SubjectSpec(
+            box=subject_box,
+            mask=await subject_mask.read() if subject_mask else None,
+            detect=detect_subject
+        )
+    except composition.SubjectError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def read_upload(file: UploadFile) -> bytes:
+    """Read an upload, rejecting oversized files and images before any decoding"""
+    contents = await file.read()
+    if len(contents) > settings.max_upload_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File too large. Max size: {settings.max_upload_size / 1024 / 1024}MB"
+        )
+    # A small, highly compressible file can still decode to gigabytes
+    size = image_size(contents)
+    if size is not None and size[0] * size[1] > settings.max_image_pixels:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image too large: {size[0]}x{size[1]}. "
+                   f"Max pixels: {settings.max_image_pixels / 1_000_000:g}MP"
+        )
+    return contents
+
+
+def shape_analysis(analysis: CompositionAnalysis, view: ResponseView) -> BaseModel:
+    """Trim an analysis to the requested view"""
+    if view == ResponseView.COMPACT:
+        return CompactCompositionAnalysis(
+            total_score=analysis.total_score,
+            genre=analysis.genre,
+            rules=[{"name": rule.name, "score": rule.score} for rule in analysis.rules]
+        )
+    if view == ResponseView.FULL:
+        return analysis.model_copy(update={
+            "metadata": {
+                k: v for k, v in analysis.metadata.items() if k not in VERBOSE_METADATA_KEYS
+            }
+        })
+    return analysis
+
+
+def render_analysis(analysis: CompositionAnalysis, view: ResponseView) -> Response:
+    """
+    Shape an analysis for the requested view and serialize it
+
+    Serializes with pydantic's compiled serializer directly, skipping
+    FastAPI's jsonable_encoder pass over the already-validated model.
+    """
+    shaped = shape_analysis(analysis, view)
+    return Response(content=shaped.model_dump_json(), media_type="application/json")
+
+
+def preview_cost(contents: bytes) -> float:
+    """
+    Estimate a preview's cost in megapixels
+
+    Previews decode the EXIF thumbnail when there is one, else JPEGs at
+    1/8 scale. PNG and WebP have no reduced decode: OpenCV decodes them at
+    full size and then resizes, so they cost as much as a full analysis.
+    """
+    from ..core.composition.exif import parse_exif
+
+    thumbnail = parse_exif(contents).get("thumbnail")
+    if thumbnail:
+        return image_cost(thumbnail)
+    if contents[:2] == b"\xff\xd8" and image_size(contents) is not None:
+        return max(0.1, image_cost(contents) / 64)
+    return image_cost(contents)
+
+
+async def run_preview(analyzer, contents: bytes) -> Dict:
+    """Preview analysis off the event loop, within the analyze budget"""
+    async with admission.admit("analyze", preview_cost(contents)):
+        return await run_held(analyzer.analyze_preview, contents)
+
+
+def preview_response(result: Dict, genre: GenreType) -> PreviewAnalysis:
+    return PreviewAnalysis(
+        total_score=result["total_score"],
+        genre=genre,
+        rules=[{"name": rule["name"], "score": rule["score"]} for rule in result["rules"]],
+        source=result["source"],
+        elapsed_ms=result["elapsed_ms"],
+        exif=result["metadata"]["exif"]
+    )
+
+
+async def analyze_contents(
+    contents: bytes,
+    filename: str,
+    genre: GenreType,
+    user_id: Optional[str] = None,
+    cancel: Optional[threading.Event] = None,
+    subject=None
+) -> CompositionAnalysis:
+    """
+    Full analysis of an uploaded image, with history caching and admission
+
+    Args:
+        contents: Encoded image
+        filename: Original upload name
+        genre: Photo genre
+        user_id: Optional user for history
+        cancel: Setting this event abandons the analysis between rules
+        subject: Optional SubjectSpec; subject analyses bypass the history
+            cache, which is keyed by file, genre and analyzer version only.
+            A hit is re-served under this request's own upload and recorded
+            for `user_id` unless that user already has it in history
+
+    Raises:
+        AdmissionRejected: The analyze budget is exhausted
+        AnalysisCancelled: `cancel` was set before the analysis finished
+        SubjectError: The subject box or mask does not fit the image
+    """
+    file_hash = hashlib.sha256(contents).hexdigest()
+    use_history = settings.history_enabled and subject is None
+
+    # Re-serve a previous result for identical uploads
+    if use_history:
+        cached = await run_in_threadpool(history_store.get_by_hash, file_hash, genre.value, user_id)
+        if cached is not None:
+            result, own = cached
+            # The stored upload and name may be another user's; never echo them
+            file_id, file_path = upload_path(filename)
+            file_path.write_bytes(contents)
+            result["metadata"].update({
+                "cached": True,
+                "file_id": file_id,
+                "filename": filename,
+                "queue_wait_ms": 0.0
+            })
+            response = CompositionAnalysis(**result)
+            if not own:
+                history_store.record(
+                    file_hash, genre.value, response.model_dump(mode="json"), user_id=user_id
+                )
+            return response
+
+    analyzer = composition.CompositionAnalyzer(genre=genre.value)
+    result, file_id, queue_wait = await run_saved(
+        contents, filename, partial(analyzer.analyze, cancel=cancel, subject=subject), cancel
+    )
+    response = to_response(result, genre, file_id, filename, file_hash, queue_wait)
+
+    if use_history:
+        history_store.record(
+            file_hash, genre.value, response.model_dump(mode="json"), user_id=user_id
+        )
+
+    return response
+
+
+async def analyze_genres_contents(
+    contents: bytes,
+    filename: str,
+    genres: List[GenreType],
+    user_id: Optional[str] = None,
+    subject=None
+) -> Dict:
+    """
+    Analyze an uploaded image for several genres, running each rule once
+
+    Every genre's result is recorded in history (unless a subject was
+    given), so later single-genre uploads of the same file are cache hits.
+
+    Returns:
+        Dict with `results` (genre -> CompositionAnalysis) and `recommendation`
+    """
+    from ..core.composition.analyzer import analyze_genres
+
+    file_hash = hashlib.sha256(contents).hexdigest()
+    result, file_id, queue_wait = await run_saved(
+        contents, filename, partial(analyze_genres, genres=[g.value for g in genres], subject=subject)
+    )
+
+    responses = {}
+    for genre in genres:
+        response = to_response(
+            result["results"][genre.value], genre, file_id, filename, file_hash, queue_wait,
+            observe=not responses
+        )
+        if settings.history_enabled and subject is None:
+            history_store.record(
+                file_hash, genre.value, response.model_dump(mode="json"), user_id=user_id
+            )
+        responses[genre] = response
+
+    return {"results": responses, "recommendation": result["recommendation"]}
+
+
+async def drain(work: "asyncio.Future"):
+    """Wait for `work` to finish, ignoring its outcome and further cancellation"""
+    while not work.done():
+        try:
+            await asyncio.shield(work)
+        except asyncio.CancelledError:
+            continue
+        except Exception:
+            break
+    if not work.cancelled():
+        work.exception()  # mark retrieved
+
+
+def upload_path(filename: str) -> Tuple[str, Path]:
+    """New file id and its path in the upload directory"""
+    # Create upload directory if not exists
+    upload_dir = Path(settings.upload_dir)
+    upload_dir.mkdir(exist_ok=True)
+
+    file_id = str(uuid.uuid4())
+    return file_id, upload_dir / f"{file_id}{Path(filename).suffix.lower()}"
+
+
+async def run_held(func: Callable, *args):
+    """
+    Run `func(*args)` in the threadpool, waiting for it even when cancelled
+
+    The worker thread cannot be interrupted; it keeps running until its
+    next rule boundary (or to the end without a cancel event). Callers
+    holding admission budget or files keep them until it actually returns.
+    """
+    work = asyncio.ensure_future(run_in_threadpool(func, *args))
+    try:
+        return await asyncio.shield(work)
+    except asyncio.CancelledError:
+        await drain(work)
+        raise
+
+
+async def run_saved(
+    contents: bytes,
+    filename: str,
+    func: Callable[[str], Dict],
+    cancel: Optional[threading.Event] = None
+):
+    """
+    Save an upload and run `func(path)` off the event loop, within the CPU budget
+
+    Returns:
+        (func's result, file id, seconds spent queued for admission)
+    """
+    # Save uploaded file
+    file_id, file_path = upload_path(filename)
+
+    try:
+        with open(file_path, "wb") as f:
+            f.write(contents)
+
+        async with admission.admit("analyze", image_cost(contents)) as queue_wait:
+            # Cancelled while queued: skip decoding entirely
+            if cancel is not None and cancel.is_set():
+                raise composition.AnalysisCancelled()
+            result = await run_held(func, str(file_path))
+    except (Exception, asyncio.CancelledError):
+        # Clean up file on error or cancellation
+        if file_path.exists():
+            file_path.unlink()
+        raise
+
+    return result, file_id, queue_wait
+
+
+def to_response(
+    result: Dict,
+    genre: GenreType,
+    file_id: str,
+    filename: str,
+    file_hash: str,
+    queue_wait: float,
+    observe: bool = True
+) -> CompositionAnalysis:
+    """Convert an analyzer result to the response model, feeding readiness"""
+    # Subject analyses process fewer pixels than the image size suggests
+    if observe and not result["metadata"].get("subject"):
+        size = result["metadata"]["image_size"]
+        readiness.observe(
+            result["metadata"]["timings_ms"], size["width"] * size["height"],
+            load_mp=admission.budgets["analyze"].in_use
+        )
+
+    return CompositionAnalysis(
+        total_score=result["total_score"],
+        genre=genre,
+        rules=[RuleScore(**rule) for rule in result["rules"]],
+        coach_guide=result["coach_guide"],
+        expert_prompt=result["expert_prompt"],
+        metadata={
+            **result["metadata"],
+            "file_id": file_id,
+            "filename": filename,
+            "file_hash": file_hash,
+            "queue_wait_ms": round(queue_wait * 1000, 1)
+        }
+    )
+
+
+@router.post("/analyze-composition", response_model=Union[CompositionAnalysis, CompactCompositionAnalysis])
 async def analyze_composition(
     file: UploadFile = File(..., description="Image file to analyze"),
-    genre: GenreType = Form(GenreType.PORTRAIT, description="Photo genre")
+    genre: GenreType = Form(GenreType.PORTRAIT, description="Photo genre"),
+    user_id: Optional[str] = Header(None, alias="X-User-Id", description="Optional user for history"),
+    view: ResponseView = Form(ResponseView.FULL, description="compact, full or verbose"),
+    subject_box: Optional[str] = Form(None, description="Subject box x,y,w,h (pixels or 0-1 fractions)"),
+    subject_mask: Optional[UploadFile] = File(None, description="Subject mask image (white = subject)"),
+    detect_subject: bool = Form(False, description="Detect the subject (face or salient region)")
 ):
     """
     Analyze photo composition and provide feedback
@@ -25,64 +372,241 @@ async def analyze_composition(
     - Image sharpness
 
     Returns composition score, detailed feedback, and improvement suggestions.
+    `view=compact` returns scores only; `view=verbose` adds weights and raw
+    per-rule metadata. Results are stored in the analysis history; re-uploading the same file
+    for the same genre returns the stored result without re-analyzing.
+
+    With a subject box, mask or `detect_subject`, exposure and sharpness are
+    measured on the subject at full resolution and thirds placement is
+    scored from the subject's position; the rest of the frame is analyzed
+    downscaled.
     """
 
     # Validate file
-    if not file.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="File must be an image")
+    validate_upload(file)
+    subject = await subject_spec(subject_box, subject_mask, detect_subject)
 
-    # Check file extension
-    file_ext = Path(file.filename).suffix.lower()
-    if file_ext not in settings.allowed_extensions:
+    try:
+        # Read and size-check the upload
+        contents = await read_upload(file)
+        response = await analyze_contents(contents, file.filename, genre, user_id, subject=subject)
+        return render_analysis(response, view)
+
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+    except HTTPException:
+        raise
+    except composition.SubjectError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+
+def parse_genres(spec: Optional[str]) -> List[GenreType]:
+    """Parse a comma-separated genre list; empty means every genre"""
+    if not spec:
+        return list(GenreType)
+    try:
+        genres = [GenreType(name.strip()) for name in spec.split(",") if name.strip()]
+    except ValueError:
         raise HTTPException(
             status_code=400,
-            detail=f"File type {file_ext} not allowed. Allowed: {settings.allowed_extensions}"
+            detail=f"Unknown genre in {spec!r}. Allowed: {[genre.value for genre in GenreType]}"
         )
+    return list(dict.fromkeys(genres)) or list(GenreType)
 
-    # Create upload directory if not exists
-    upload_dir = Path(settings.upload_dir)
-    upload_dir.mkdir(exist_ok=True)
 
-    # Save uploaded file
-    file_id = str(uuid.uuid4())
-    file_path = upload_dir / f"{file_id}{file_ext}"
+@router.post("/analyze-composition/genres", response_model=MultiGenreAnalysis)
+async def analyze_composition_genres(
+    file: UploadFile = File(..., description="Image file to analyze"),
+    genres: Optional[str] = Form(None, description="Comma-separated genres (default: all)"),
+    user_id: Optional[str] = Header(None, alias="X-User-Id", description="Optional user for history"),
+    view: ResponseView = Form(ResponseView.FULL, description="compact, full or verbose"),
+    subject_box: Optional[str] = Form(None, description="Subject box x,y,w,h (pixels or 0-1 fractions)"),
+    subject_mask: Optional[UploadFile] = File(None, description="Subject mask image (white = subject)"),
+    detect_subject: bool = Form(False, description="Detect the subject (face or salient region)")
+):
+    """
+    Analyze one photo for several genres at once
+
+    Rules run once and their results are weighted per genre, so scoring
+    every genre costs about the same as scoring one. Returns each genre's
+    score, coach guide and expert prompt, plus a recommended genre inferred
+    from the image (frame shape, horizon, detected face, lighting).
+    """
+    validate_upload(file)
+    genre_list = parse_genres(genres)
+    subject = await subject_spec(subject_box, subject_mask, detect_subject)
 
     try:
-        # Write file
-        contents = await file.read()
-
-        # Check file size
-        if len(contents) > settings.max_upload_size:
-            raise HTTPException(
-                status_code=400,
-                detail=f"File too large. Max size: {settings.max_upload_size / 1024 / 1024}MB"
-            )
+        contents = await read_upload(file)
+        analysis = await analyze_genres_contents(contents, file.filename, genre_list, user_id, subject)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+    except HTTPException:
+        raise
+    except composition.SubjectError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
-        with open(file_path, "wb") as f:
-            f.write(contents)
+    response = MultiGenreAnalysis(
+        results={genre: shape_analysis(result, view) for genre, result in analysis["results"].items()},
+        recommendation=GenreRecommendation(**analysis["recommendation"])
+    )
+    return Response(content=response.model_dump_json(), media_type="application/json")
 
-        # Analyze composition
-        analyzer = CompositionAnalyzer(genre=genre.value)
-        result = analyzer.analyze(str(file_path))
-
-        # Convert to response model
-        response = CompositionAnalysis(
-            total_score=result["total_score"],
-            genre=genre,
-            rules=[RuleScore(**rule) for rule in result["rules"]],
-            coach_guide=result["coach_guide"],
-            expert_prompt=result["expert_prompt"],
-            metadata={
-                **result["metadata"],
-                "file_id": file_id,
-                "filename": file.filename
-            }
+
+def sse_event(event: str, payload: Dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+async def progressive_events(
+    contents: bytes,
+    filename: str,
+    genre: GenreType,
+    user_id: Optional[str],
+    view: ResponseView,
+    subject=None
+) -> AsyncIterator[str]:
+    """
+    Yield the preview, then the refined analysis, as server-sent events
+
+    Every payload carries `phase` (preview, final, cancelled or error). The
+    refinement stops when the client disconnects or cancels the stream id.
+    """
+    stream_id = str(uuid.uuid4())
+    cancel = threading.Event()
+    refinements[stream_id] = cancel
+    refine = None
+
+    try:
+        analyzer = composition.CompositionAnalyzer(genre=genre.value)
+        try:
+            preview = await run_preview(analyzer, contents)
+        except AdmissionRejected as e:
+            yield sse_event("error", {
+                "phase": "error", "status_code": e.status_code, "detail": e.detail,
+                "retry_after": e.retry_after
+            })
+            return
+        except ValueError as e:
+            yield sse_event("error", {"phase": "error", "status_code": 400, "detail": str(e)})
+            return
+
+        yield sse_event("preview", {
+            "phase": "preview",
+            "stream_id": stream_id,
+            "result": preview_response(preview, genre).model_dump(mode="json")
+        })
+
+        refine = asyncio.ensure_future(
+            analyze_contents(contents, filename, genre, user_id, cancel, subject)
         )
+        try:
+            response = await refine
+        except composition.AnalysisCancelled:
+            yield sse_event("cancelled", {"phase": "cancelled", "stream_id": stream_id})
+            return
+        except AdmissionRejected as e:
+            yield sse_event("error", {
+                "phase": "error", "status_code": e.status_code, "detail": e.detail,
+                "retry_after": e.retry_after
+            })
+            return
+        except composition.SubjectError as e:
+            yield sse_event("error", {"phase": "error", "status_code": 400, "detail": str(e)})
+            return
+        except Exception as e:
+            yield sse_event("error", {
+                "phase": "error", "status_code": 500, "detail": f"Analysis failed: {str(e)}"
+            })
+            return
 
-        return response
+        yield sse_event("final", {
+            "phase": "final",
+            "stream_id": stream_id,
+            "result": shape_analysis(response, view).model_dump(mode="json")
+        })
+    finally:
+        # Client disconnects land here too; stop the refinement at the next rule
+        cancel.set()
+        if refine is not None and not refine.done():
+            refine.cancel()
+        refinements.pop(stream_id, None)
 
-    except Exception as e:
-        # Clean up file on error
-        if file_path.exists():
-            file_path.unlink()
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+@router.post("/analyze-composition/stream")
+async def stream_composition(
+    file: UploadFile = File(..., description="Image file to analyze"),
+    genre: GenreType = Form(GenreType.PORTRAIT, description="Photo genre"),
+    user_id: Optional[str] = Header(None, alias="X-User-Id", description="Optional user for history"),
+    view: ResponseView = Form(ResponseView.FULL, description="View of the final analysis"),
+    subject_box: Optional[str] = Form(None, description="Subject box x,y,w,h (pixels or 0-1 fractions)"),
+    subject_mask: Optional[UploadFile] = File(None, description="Subject mask image (white = subject)"),
+    detect_subject: bool = Form(False, description="Detect the subject (face or salient region)")
+):
+    """
+    Progressive analysis over server-sent events
+
+    Emits a `preview` event with scores from the EXIF thumbnail or a
+    reduced decode within tens of milliseconds, then a `final` event with
+    the full-resolution analysis in the requested view. Close the stream,
+    or DELETE /analyze-composition/stream/{stream_id}, to skip the
+    refinement when the preview is good enough.
+    """
+    validate_upload(file)
+    subject = await subject_spec(subject_box, subject_mask, detect_subject)
+    contents = await read_upload(file)
+
+    return StreamingResponse(
+        progressive_events(contents, file.filename, genre, user_id, view, subject),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.delete("/analyze-composition/stream/{stream_id}")
+async def cancel_stream(stream_id: str):
+    """
+    Cancel the refinement phase of a progressive analysis
+
+    Streams are tracked per server process, so with several workers the
+    request must reach the worker serving the stream; closing the stream
+    works everywhere.
+    """
+    cancel = refinements.get(stream_id)
+    if cancel is None:
+        raise HTTPException(status_code=404, detail="Stream not found or already finished")
+    cancel.set()
+    return {"stream_id": stream_id, "cancelled": True}
+
+
+@router.post("/analyze-composition/preview", response_model=PreviewAnalysis)
+async def preview_composition(
+    file: UploadFile = File(..., description="Image file to analyze"),
+    genre: GenreType = Form(GenreType.PORTRAIT, description="Photo genre")
+):
+    """
+    Preliminary composition scores, typically in a few milliseconds
+
+    Scores the EXIF thumbnail embedded by most cameras and phones, or a
+    1/8-scale decode when there is none. Nothing is saved or recorded in
+    history; call /analyze-composition for the full analysis. Previews
+    share the analyze budget; PNG and WebP, which have no reduced decode,
+    are charged their full size.
+    """
+    validate_upload(file)
+    contents = await read_upload(file)
+
+    try:
+        analyzer = composition.CompositionAnalyzer(genre=genre.value)
+        result = await run_preview(analyzer, contents)
+    except AdmissionRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    preview = preview_response(result, genre)
+    return Response(content=preview.model_dump_json(), media_type="application/json")
@@ -1,29 +1,21 @@
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
 from fastapi.responses import JSONResponse
+import asyncio
 import os
 import uuid
 from pathlib import Path
-from typing import Optional
-from ..services.gemini_client import GeminiClient
-from ..models.schemas import GenerateRequest, GenerateResponse
+from typing import Dict, Optional
+from ..core.admission import AdmissionRejected, admission
+from ..services.gemini_client import get_gemini_client
+from ..services.job_queue import JobQueue, QueueFullError
+from ..models.schemas import GenerateRequest, GenerateResponse, JobStatus, JobSubmitted
 from ..core.config import settings
 
 router = APIRouter()
 
 
-@router.post("/generate-nanobanana", response_model=GenerateResponse)
-async def generate_nanobanana(
-    file: UploadFile = File(..., description="Original image file"),
-    prompt: str = Form(..., description="Improvement instructions"),
-    style: Optional[str] = Form("natural", description="Style preset (natural/vivid/dramatic)"),
-    strength: Optional[float] = Form(0.7, description="Modification strength (0-1)")
-):
-    """
-    Generate improved image using Google Gemini (Nano-Banana)
-
-    Takes an original image and improvement instructions,
-    returns AI-enhanced version with suggested modifications.
-    """
+async def _save_upload(file: UploadFile, style: str, strength: float) -> Dict:
+    """Validate a generation upload and save it to the upload directory"""
 
     # Validate file
     if not file.content_type.startswith("image/"):
@@ -52,51 +44,158 @@ async def generate_nanobanana(
 
     file_id = str(uuid.uuid4())
     input_path = upload_dir / f"{file_id}_input{file_ext}"
-    output_path = output_dir / f"{file_id}_output{file_ext}"
 
-    try:
-        # Save input file
-        contents = await file.read()
+    contents = await file.read()
 
-        if len(contents) > settings.max_upload_size:
-            raise HTTPException(status_code=400, detail="File too large")
+    if len(contents) > settings.max_upload_size:
+        raise HTTPException(status_code=400, detail="File too large")
 
-        with open(input_path, "wb") as f:
-            f.write(contents)
+    with open(input_path, "wb") as f:
+        f.write(contents)
 
-        # Generate improved image
-        client = GeminiClient()
+    return {
+        "file_id": file_id,
+        "file_ext": file_ext,
+        "input_path": str(input_path),
+        "output_path": str(output_dir / f"{file_id}_output{file_ext}"),
+        "original_filename": file.filename,
+        "style": style,
+        "strength": strength
+    }
+
+
+def _remove_files(job: Dict):
+    for path in (job["input_path"], job["output_path"]):
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+async def _run_generation(job: Dict, prompt: str) -> Dict:
+    """Call the Gemini backend for a saved upload; cleans up files on failure"""
+    try:
+        client = get_gemini_client()
         result = await client.generate_image(
-            str(input_path),
+            job["input_path"],
             prompt,
-            style,
-            strength
+            job["style"],
+            job["strength"]
         )
-
-        if result["success"]:
-            return GenerateResponse(
-                success=True,
-                image_url=f"/outputs/{file_id}_output{file_ext}",
-                metadata={
-                    "file_id": file_id,
-                    "original_filename": file.filename,
-                    "style": style,
-                    "strength": strength,
-                    **result
-                }
-            )
-        else:
-            raise HTTPException(status_code=500, detail=result.get("error", "Generation failed"))
-
-    except HTTPException:
+    except asyncio.CancelledError:
+        # Timed out; nothing will read the files
+        _remove_files(job)
         raise
     except Exception as e:
-        # Clean up files on error
-        if input_path.exists():
-            input_path.unlink()
-        if output_path.exists():
-            output_path.unlink()
-        raise HTTPException(status_code=500, detail=f"Generation failed: {str(e)}")
+        result = {"success": False, "error": str(e)}
+
+    if not result["success"]:
+        _remove_files(job)
+        return result
+
+    return GenerateResponse(
+        success=True,
+        image_url=f"/outputs/{job['file_id']}_output{job['file_ext']}",
+        metadata={
+            "file_id": job["file_id"],
+            "original_filename": job["original_filename"],
+            "style": job["style"],
+            "strength": job["strength"],
+            **result
+        }
+    ).model_dump()
+
+
+async def _generation_job_handler(payload: Dict) -> Dict:
+    result = await _run_generation(payload, payload["prompt"])
+    if not result["success"]:
+        raise RuntimeError(result.get("error", "Generation failed"))
+    return result
+
+
+generation_jobs = JobQueue(_generation_job_handler)
+
+
+@router.post("/generate-nanobanana", response_model=GenerateResponse)
+async def generate_nanobanana(
+    file: UploadFile = File(..., description="Original image file"),
+    prompt: str = Form(..., description="Improvement instructions"),
+    style: Optional[str] = Form("natural", description="Style preset (natural/vivid/dramatic)"),
+    strength: Optional[float] = Form(0.7, description="Modification strength (0-1)")
+):
+    """
+    Generate improved image using Google Gemini (Nano-Banana)
+
+    Takes an original image and improvement instructions,
+    returns AI-enhanced version with suggested modifications.
+    Holds the connection for the whole Gemini call; prefer
+    `/generate-nanobanana/jobs` under load.
+    """
+    saved = await _save_upload(file, style, strength)
+    try:
+        async with admission.admit("generate", 1):
+            result = await asyncio.wait_for(_run_generation(saved, prompt), settings.generation_timeout)
+    except AdmissionRejected as e:
+        os.unlink(saved["input_path"])
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504, detail=f"Generation timed out after {settings.generation_timeout}s"
+        )
+
+    if result["success"]:
+        return result
+    raise HTTPException(status_code=500, detail=result.get("error", "Generation failed"))
+
+
+@router.post("/generate-nanobanana/jobs", response_model=JobSubmitted, status_code=202)
+async def submit_generation_job(
+    file: UploadFile = File(..., description="Original image file"),
+    prompt: str = Form(..., description="Improvement instructions"),
+    style: Optional[str] = Form("natural", description="Style preset (natural/vivid/dramatic)"),
+    strength: Optional[float] = Form(0.7, description="Modification strength (0-1)"),
+    priority: int = Form(0, ge=0, le=9, description="Higher runs first (0-9)"),
+    callback_url: Optional[str] = Form(None, description="URL to POST the finished job to")
+):
+    """
+    Queue an image generation job
+
+    Returns a job ID immediately. Poll `/generate-nanobanana/jobs/{job_id}`
+    or pass `callback_url` to receive the finished job as a POST.
+    Returns 429 when the queue is full.
+    """
+    saved = await _save_upload(file, style, strength)
+
+    try:
+        job = generation_jobs.submit(
+            {**saved, "prompt": prompt},
+            priority=priority,
+            callback_url=callback_url
+        )
+    except (QueueFullError, ValueError) as e:
+        os.unlink(saved["input_path"])
+        if isinstance(e, QueueFullError):
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return JobSubmitted(
+        job_id=job.job_id,
+        status=job.status,
+        status_url=f"{settings.api_prefix}/generate-nanobanana/jobs/{job.job_id}"
+    )
+
+
+@router.get("/generate-nanobanana/jobs/metrics")
+async def generation_job_metrics():
+    """Queue depth, throughput and latency counters for generation jobs"""
+    return generation_jobs.metrics()
+
+
+@router.get("/generate-nanobanana/jobs/{job_id}", response_model=JobStatus)
+async def get_generation_job(job_id: str):
+    """Poll the status of a generation job"""
+    job = generation_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
 
 @router.get("/health")
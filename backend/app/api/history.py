@@ -0,0 +1,46 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+from ..services.history_store import history_store
+from ..models.schemas import GenreType, HistoryDetail, HistoryPage
+from ..core.config import settings
+
+router = APIRouter()
+
+
+@router.get("/history", response_model=HistoryPage)
+def list_history(
+    user_id: Optional[str] = Query(None, description="Only entries for this user"),
+    genre: Optional[GenreType] = Query(None, description="Only entries for this genre"),
+    min_score: Optional[float] = Query(None, ge=0, le=100, description="Minimum total score"),
+    max_score: Optional[float] = Query(None, ge=0, le=100, description="Maximum total score"),
+    cursor: Optional[int] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(settings.history_page_size, ge=1, le=settings.history_max_page_size)
+):
+    """
+    List past analyses, newest first
+
+    Pass the returned `next_cursor` to fetch the following page.
+    """
+    if not settings.history_enabled:
+        raise HTTPException(status_code=404, detail="History is disabled")
+
+    return history_store.query(
+        user_id=user_id,
+        genre=genre.value if genre else None,
+        min_score=min_score,
+        max_score=max_score,
+        cursor=cursor,
+        limit=limit
+    )
+
+
+@router.get("/history/{entry_id}", response_model=HistoryDetail)
+def get_history_entry(entry_id: int):
+    """Return a stored analysis with its full result"""
+    if not settings.history_enabled:
+        raise HTTPException(status_code=404, detail="History is disabled")
+
+    entry = history_store.get(entry_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="History entry not found")
+    return entry
@@ -0,0 +1,333 @@
+"""
+Offline bulk scoring of photo directories
+
+Walks a directory tree and scores every image with the same analyzer the
+API uses, spreading work across processes. Results stream to JSONL (one
+object per line) or to Parquet part files, and a checkpoint file records
+finished paths so an interrupted run resumes where it stopped. Paths that
+failed are listed next to it and skipped on resume unless --retry-errors
+is given; a worker process dying (out of memory, a decoder crash) only
+costs the file that killed it an error row.
+
+Usage (from backend/):
+    python -m app.cli score PHOTOS_DIR -o results.jsonl --genre landscape
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
+from .core.config import settings
+
+
+def iter_images(root: Path) -> Iterator[str]:
+    """Yield image paths under root, relative to it, in a stable order"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if Path(name).suffix.lower() in settings.allowed_extensions:
+                yield os.path.relpath(os.path.join(dirpath, name), root)
+
+
+def load_checkpoint(path: Path) -> Set[str]:
+    if not path.exists():
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def _init_worker():
+    # One process per core already saturates the machine; keep each single-threaded
+    from .core.runtime import configure_opencv
+    configure_opencv(threads=1)
+    settings.analysis_threads = 1
+
+
+def _decode_ahead(root: str, paths: List[str], out: "queue.Queue"):
+    from .core.composition.exif import load_image
+    for rel in paths:
+        try:
+            out.put((rel, *load_image(os.path.join(root, rel))))
+        except Exception as e:
+            # The consumer expects one entry per path; report the failure in its row
+            out.put((rel, None, {"error": f"Failed to load image: {e}"}))
+
+
+def score_chunk(root: str, paths: List[str], genre: str, prefetch: int, full: bool) -> List[Dict]:
+    """
+    Score a chunk of images inside a worker process
+
+    A background thread decodes up to `prefetch` images ahead of the one
+    being analyzed, so decoding overlaps with analysis without holding the
+    whole chunk in memory.
+    """
+    from .core.composition import CompositionAnalyzer
+
+    analyzer = CompositionAnalyzer(genre=genre)
+    decoded: "queue.Queue" = queue.Queue(maxsize=prefetch)
+    threading.Thread(target=_decode_ahead, args=(root, paths, decoded), daemon=True).start()
+
+    rows = []
+    for _ in paths:
+        rel, image, exif = decoded.get()
+        row = {"path": rel, "genre": genre}
+        try:
+            if image is None:
+                raise ValueError(exif.get("error", "Failed to load image"))
+            result = analyzer.analyze_image(image, exif)
+            row.update({
+                "total_score": result["total_score"],
+                "scores": {rule["name"]: rule["score"] for rule in result["rules"]},
+                "width": result["metadata"]["image_size"]["width"],
+                "height": result["metadata"]["image_size"]["height"]
+            })
+            if full:
+                row["result"] = result
+        except Exception as e:
+            row["error"] = str(e)
+        rows.append(row)
+    return rows
+
+
+def score_isolated(root: str, paths: List[str], args) -> Iterator[List[Dict]]:
+    """
+    Score paths one per task in a single-process pool, yielding each row
+
+    Used for the chunks lost when a worker dies: the pool is replaced
+    whenever a file kills it, and that file alone gets an error row.
+    """
+    pool = None
+    try:
+        for rel in paths:
+            if pool is None:
+                pool = ProcessPoolExecutor(max_workers=1, initializer=_init_worker)
+            try:
+                yield pool.submit(score_chunk, root, [rel], args.genre, args.prefetch, args.full).result()
+            except BrokenProcessPool:
+                pool.shutdown()
+                pool = None
+                yield [{
+                    "path": rel,
+                    "genre": args.genre,
+                    "error": "Worker process died (out of memory or a decoder crash)"
+                }]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+class JsonlWriter:
+    """Appends one JSON object per line, flushing after every batch"""
+
+    def __init__(self, path: Path):
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write(self, rows: List[Dict]):
+        for row in rows:
+            self.file.write(json.dumps(row, ensure_ascii=False, default=float) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def _score_column(display_name: str) -> str:
+    return f"score_{display_name.lower().replace(' ', '_')}"
+
+
+class ParquetWriter:
+    """
+    Writes flat columnar rows to a new part file per run
+
+    Each batch becomes a row group; resumed runs add another part file to
+    the output directory instead of rewriting earlier ones. The schema is
+    fixed up front from the registered rules, so batches of error rows
+    (which have no scores) share it.
+    """
+
+    def __init__(self, path: Path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output requires pyarrow (pip install pyarrow)")
+
+        # Importing the analyzer registers the built-in rules
+        from .core.composition.analyzer import RULES
+
+        path.mkdir(parents=True, exist_ok=True)
+        self.pa = pa
+        self.pq = pq
+        self.path = path / f"part-{int(time.time())}.parquet"
+        self.schema = pa.schema(
+            [
+                ("path", pa.string()),
+                ("genre", pa.string()),
+                ("total_score", pa.float64()),
+                ("width", pa.int64()),
+                ("height", pa.int64()),
+                ("error", pa.string())
+            ]
+            + [(_score_column(rule.display_name), pa.float64()) for rule in RULES.values()]
+        )
+        self.writer = None
+
+    def write(self, rows: List[Dict]):
+        flat = []
+        for row in rows:
+            record = {
+                "path": row["path"],
+                "genre": row["genre"],
+                "total_score": row.get("total_score"),
+                "width": row.get("width"),
+                "height": row.get("height"),
+                "error": row.get("error")
+            }
+            for name, score in row.get("scores", {}).items():
+                record[_score_column(name)] = score
+            flat.append(record)
+
+        table = self.pa.Table.from_pylist(flat, schema=self.schema)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.path, self.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def score_directory(args) -> int:
+    root = Path(args.root).resolve()
+    output = Path(args.output)
+    checkpoint = Path(args.checkpoint or f"{output}.checkpoint")
+    error_log = Path(f"{checkpoint}.errors")
+
+    done = load_checkpoint(checkpoint)
+    failed = set() if args.retry_errors else load_checkpoint(error_log) - done
+    pending = [rel for rel in iter_images(root) if rel not in done and rel not in failed]
+    total = len(pending)
+    print(f"{len(done)} already scored, {len(failed)} failed earlier, {total} to go", file=sys.stderr)
+    if not pending:
+        return 0
+
+    writer = ParquetWriter(output) if args.format == "parquet" else JsonlWriter(output)
+    chunks = [pending[i:i + args.chunk_size] for i in range(0, total, args.chunk_size)]
+    workers = args.workers or os.cpu_count() or 1
+    # Keep a bounded number of chunks in flight so memory stays flat on huge trees
+    max_inflight = workers * 2
+
+    scored = errors = 0
+    start = last_report = time.monotonic()
+    with open(checkpoint, "a", encoding="utf-8") as ckpt, open(error_log, "a", encoding="utf-8") as errs:
+
+        def record(rows: List[Dict]):
+            nonlocal scored, errors
+            # Results first, then checkpoint: a crash in between re-scores, never loses.
+            # Failures go to the error list, so --retry-errors can pick them up
+            writer.write(rows)
+            ckpt.write("".join(f"{row['path']}\n" for row in rows if "error" not in row))
+            errs.write("".join(f"{row['path']}\n" for row in rows if "error" in row))
+            ckpt.flush()
+            errs.flush()
+            scored += len(rows)
+            errors += sum(1 for row in rows if "error" in row)
+
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        inflight: Dict[Future, List[str]] = {}
+        next_chunk = 0
+        try:
+            while inflight or next_chunk < len(chunks):
+                while next_chunk < len(chunks) and len(inflight) < max_inflight:
+                    future = pool.submit(
+                        score_chunk, str(root), chunks[next_chunk], args.genre, args.prefetch, args.full
+                    )
+                    inflight[future] = chunks[next_chunk]
+                    next_chunk += 1
+
+                finished, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                lost = []
+                for future in finished:
+                    paths = inflight.pop(future)
+                    try:
+                        record(future.result())
+                    except BrokenProcessPool:
+                        lost += paths
+
+                if lost:
+                    # A dead worker breaks the whole pool and fails every task still
+                    # in it; keep what finished, retry the rest file by file
+                    pool.shutdown()
+                    for future, paths in inflight.items():
+                        if future.exception() is None:
+                            record(future.result())
+                        else:
+                            lost += paths
+                    inflight.clear()
+                    print(f"A worker process died; retrying {len(lost)} images one at a time", file=sys.stderr)
+                    for rows in score_isolated(str(root), lost, args):
+                        record(rows)
+                    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+                now = time.monotonic()
+                if now - last_report >= args.progress_interval or scored == total:
+                    rate = scored / (now - start) if now > start else 0.0
+                    print(
+                        f"{scored}/{total} scored ({errors} errors), {rate:.1f} images/s",
+                        file=sys.stderr
+                    )
+                    last_report = now
+        except KeyboardInterrupt:
+            for future in inflight:
+                future.cancel()
+            print("Interrupted; rerun the same command to resume", file=sys.stderr)
+            return 130
+        finally:
+            writer.close()
+            pool.shutdown()
+
+    elapsed = time.monotonic() - start
+    print(f"Done: {scored} images in {elapsed:.1f}s ({scored / elapsed:.1f} images/s)", file=sys.stderr)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Photo Guide offline tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    score = commands.add_parser("score", help="Score every image under a directory")
+    score.add_argument("root", help="Directory to walk")
+    score.add_argument("-o", "--output", required=True, help="JSONL file, or directory for parquet")
+    score.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    score.add_argument("--genre", choices=["portrait", "landscape", "product"], default="portrait")
+    score.add_argument("--workers", type=int, default=0, help="Processes (default: all cores)")
+    score.add_argument("--chunk-size", type=int, default=32, help="Images per worker task")
+    score.add_argument("--prefetch", type=int, default=2, help="Decoded images buffered per worker")
+    score.add_argument("--checkpoint", help="Checkpoint file (default: <output>.checkpoint)")
+    score.add_argument("--full", action="store_true", help="Include the complete analysis (JSONL only)")
+    score.add_argument("--retry-errors", action="store_true", help="Re-score paths that failed in earlier runs")
+    score.add_argument("--progress-interval", type=float, default=2.0, help="Seconds between reports")
+    score.set_defaults(func=score_directory)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "score" and args.full and args.format == "parquet":
+        parser.error("--full is only supported with --format jsonl")
+
+    # Before OpenCV loads, so workers inherit the decoder pixel limit
+    from .core.runtime import configure_process
+    configure_process()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
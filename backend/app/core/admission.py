@@ -0,0 +1,345 @@
+import asyncio
+import math
+import struct
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, nullcontext
+from typing import Dict, Optional, Tuple
+from starlette.responses import JSONResponse
+from .config import settings
+
+
+class AdmissionRejected(Exception):
+    """Raised when work cannot be admitted; carries the HTTP status and Retry-After"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(self.retry_after)}
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate` tokens per second"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, amount: float = 1.0) -> float:
+        """Take tokens; returns 0 on success, else seconds until enough are available"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+
+class CostBudget:
+    """
+    Caps the total estimated cost of in-flight work
+
+    Requests wait in FIFO order for capacity up to `max_wait` seconds and
+    are rejected with 503 after that, or immediately when `max_waiting`
+    requests are already queued.
+    """
+
+    def __init__(self, name: str, capacity: float, max_wait: float, max_waiting: int):
+        self.name = name
+        self.capacity = capacity
+        self.max_wait = max_wait
+        self.max_waiting = max_waiting
+
+        self.in_use = 0.0
+        self.waiting = 0
+        self._cond: Optional[asyncio.Condition] = None
+        self._counters = {"admitted": 0, "shed": 0}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._hold_total = 0.0
+        self._completed = 0
+
+    @property
+    def cond(self) -> asyncio.Condition:
+        # Created lazily so it binds to the server's event loop
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def retry_after(self) -> float:
+        """Rough seconds until capacity frees up, from the average hold time"""
+        avg_hold = self._hold_total / self._completed if self._completed else 1.0
+        return avg_hold * (self.waiting + 1)
+
+    @asynccontextmanager
+    async def reserve(self, cost: float):
+        # A single request larger than the whole budget may still run alone
+        cost = min(cost, self.capacity)
+        start = time.monotonic()
+
+        async with self.cond:
+            if self.waiting >= self.max_waiting:
+                self._counters["shed"] += 1
+                raise AdmissionRejected(503, f"{self.name} queue is full", self.retry_after())
+
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(
+                    self.cond.wait_for(lambda: self.in_use + cost <= self.capacity),
+                    timeout=self.max_wait
+                )
+            except asyncio.TimeoutError:
+                self._counters["shed"] += 1
+                raise AdmissionRejected(503, f"{self.name} capacity exhausted", self.retry_after())
+            finally:
+                self.waiting -= 1
+
+            self.in_use += cost
+
+        waited = time.monotonic() - start
+        self._counters["admitted"] += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+
+        held_from = time.monotonic()
+        try:
+            yield waited
+        finally:
+            self._hold_total += time.monotonic() - held_from
+            self._completed += 1
+            async with self.cond:
+                self.in_use -= cost
+                self.cond.notify_all()
+
+    def metrics(self) -> Dict:
+        admitted = self._counters["admitted"]
+        return {
+            **self._counters,
+            "capacity": self.capacity,
+            "in_use": round(self.in_use, 2),
+            "waiting": self.waiting,
+            "avg_queue_wait_ms": round(self._wait_total / admitted * 1000, 1) if admitted else 0.0,
+            "max_queue_wait_ms": round(self._wait_max * 1000, 1),
+            "avg_hold_ms": round(self._hold_total / self._completed * 1000, 1) if self._completed else 0.0
+        }
+
+
+class AdmissionController:
+    """Per-client rate limits and per-endpoint cost budgets for analyze and generate"""
+
+    MAX_TRACKED_CLIENTS = 10000
+
+    def __init__(self):
+        self.budgets = {
+            "analyze": CostBudget(
+                "analyze",
+                capacity=settings.admission_analyze_capacity_mp,
+                max_wait=settings.admission_max_queue_wait,
+                max_waiting=settings.admission_max_waiting
+            ),
+            "generate": CostBudget(
+                "generate",
+                capacity=settings.admission_generate_capacity,
+                max_wait=settings.admission_max_queue_wait,
+                max_waiting=settings.admission_max_waiting
+            )
+        }
+        self.rates = {
+            "analyze": (settings.rate_limit_analyze_per_minute / 60, settings.rate_limit_analyze_burst),
+            "generate": (settings.rate_limit_generate_per_minute / 60, settings.rate_limit_generate_burst)
+        }
+        self._buckets: "OrderedDict[tuple, TokenBucket]" = OrderedDict()
+        self._inflight = {name: 0 for name in self.budgets}
+        self._rate_limited = {name: 0 for name in self.budgets}
+
+    def begin_request(self, budget: str, client_id: str):
+        """
+        Admit a request into a budget, charging the client's token bucket
+
+        Raises:
+            AdmissionRejected: 429 when the client is over its rate,
+                503 when too many requests are already in flight
+        """
+        key = (budget, client_id)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rate, burst = self.rates[budget]
+            bucket = self._buckets[key] = TokenBucket(rate, burst)
+            if len(self._buckets) > self.MAX_TRACKED_CLIENTS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+
+        wait = bucket.take()
+        if wait:
+            self._rate_limited[budget] += 1
+            raise AdmissionRejected(429, "Rate limit exceeded", wait)
+
+        if self._inflight[budget] >= settings.admission_max_inflight:
+            raise AdmissionRejected(503, "Server is at capacity", self.budgets[budget].retry_after())
+        self._inflight[budget] += 1
+
+    def end_request(self, budget: str):
+        self._inflight[budget] -= 1
+
+    def admit(self, budget: str, cost: float):
+        """Reserve `cost` units of a budget for the duration of the block"""
+        if not settings.admission_enabled:
+            return nullcontext(0.0)
+        return self.budgets[budget].reserve(cost)
+
+    def metrics(self) -> Dict:
+        return {
+            name: {
+                **budget.metrics(),
+                "inflight_requests": self._inflight[name],
+                "rate_limited": self._rate_limited[name]
+            }
+            for name, budget in self.budgets.items()
+        }
+
+
+def image_size(contents: bytes) -> Optional[Tuple[int, int]]:
+    """
+    (width, height) from a JPEG, PNG or WebP header, or None if unreadable
+
+    Parsed directly rather than with Pillow, whose decompression-bomb check
+    refuses exactly the oversized headers this needs to measure.
+    """
+    if contents[:8] == b"\x89PNG\r\n\x1a\n" and contents[12:16] == b"IHDR":
+        size = struct.unpack(">II", contents[16:24])
+    elif contents[:4] == b"RIFF" and contents[8:12] == b"WEBP":
+        chunk = contents[12:16]
+        if chunk == b"VP8 " and contents[23:26] == b"\x9d\x01\x2a":
+            width, height = struct.unpack("<HH", contents[26:30])
+            size = (width & 0x3FFF, height & 0x3FFF)
+        elif chunk == b"VP8L" and contents[20:21] == b"\x2f":
+            bits = int.from_bytes(contents[21:25], "little")
+            size = ((bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1)
+        elif chunk == b"VP8X":
+            size = (int.from_bytes(contents[24:27], "little") + 1, int.from_bytes(contents[27:30], "little") + 1)
+        else:
+            return None
+    elif contents[:2] == b"\xff\xd8":
+        size = _jpeg_size(contents)
+    else:
+        return None
+    if size is None or not size[0] or not size[1]:
+        return None
+    return size
+
+
+def _jpeg_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """Walk JPEG segment headers up to the first SOFn frame header"""
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:  # standalone markers
+            pos += 2
+            continue
+        # SOF0-SOF15, except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if pos + 9 > len(data):
+                return None
+            height, width = struct.unpack(">HH", data[pos + 5:pos + 9])
+            return width, height
+        pos += 2 + struct.unpack(">H", data[pos + 2:pos + 4])[0]
+    return None
+
+
+def image_cost(contents: bytes) -> float:
+    """
+    Estimate analysis cost in megapixels from the image header
+
+    Only the header is parsed, so this is cheap even for large uploads.
+    An image whose size cannot be read is charged the whole analyze
+    budget, so it runs alone rather than slipping in at a token cost.
+    """
+    size = image_size(contents)
+    if size is None:
+        return settings.admission_analyze_capacity_mp
+    width, height = size
+    return max(0.1, width * height / 1_000_000)
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying per-client rate limits and in-flight request caps
+
+    Requests are matched to a budget by path; anything else passes through.
+    Cost-based admission happens in the handlers, where the image header is
+    available, through `admission.admit`.
+    """
+
+    ROUTES = {
+        "/analyze-composition": "analyze",
+        "/generate-nanobanana": "generate"
+    }
+
+    def __init__(self, app, controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.controller = controller or admission
+
+    def _budget_for(self, path: str) -> Optional[str]:
+        if not path.startswith(settings.api_prefix):
+            return None
+        path = path[len(settings.api_prefix):]
+        for prefix, budget in self.ROUTES.items():
+            if path.startswith(prefix):
+                return budget
+        return None
+
+    def _client_id(self, scope) -> str:
+        """
+        Client address for rate limiting
+
+        With `admission_client_header` set (e.g. X-Forwarded-For), each proxy
+        appends the address it received the request from, so only entries
+        added by our own proxies can be trusted; anything further left was
+        written by the client. The entry `admission_proxy_hops` from the
+        right is used.
+        """
+        if settings.admission_client_header:
+            name = settings.admission_client_header.lower().encode("latin-1")
+            for key, value in scope.get("headers", []):
+                if key == name:
+                    entries = [e.strip() for e in value.decode("latin-1").split(",") if e.strip()]
+                    if entries:
+                        hops = max(1, settings.admission_proxy_hops)
+                        return entries[-min(hops, len(entries))]
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def __call__(self, scope, receive, send):
+        budget = self._budget_for(scope["path"]) if scope["type"] == "http" else None
+        if budget is None or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            self.controller.begin_request(budget, self._client_id(scope))
+        except AdmissionRejected as e:
+            response = JSONResponse({"detail": e.detail}, status_code=e.status_code, headers=e.headers)
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.end_request(budget)
+
+
+admission = AdmissionController()
@@ -1,3 +1,21 @@
-from .analyzer import CompositionAnalyzer
+# The analyzer pulls in OpenCV and NumPy; load it on first attribute access
+# so importing the package (e.g. at server startup) stays cheap.
+__all__ = ["ANALYZER_VERSION", "AnalysisCancelled", "CompositionAnalyzer", "SubjectError", "SubjectSpec"]
 
-__all__ = ["CompositionAnalyzer"]
+# Bump whenever a change alters scores or result fields; the history cache
+# only re-serves results recorded under the current version
+ANALYZER_VERSION = 2
+
+_LAZY = {
+    "AnalysisCancelled": "registry",
+    "CompositionAnalyzer": "analyzer",
+    "SubjectError": "roi",
+    "SubjectSpec": "roi"
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        from importlib import import_module
+        return getattr(import_module(f".{_LAZY[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
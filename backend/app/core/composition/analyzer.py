@@ -1,6 +1,12 @@
-import cv2
+import threading
+import time
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+from ..config import settings
+from .exif import decode_image, decode_thumbnail, exif_summary, load_image, parse_exif
+from .registry import RULES, run_rules
+from .roi import SubjectRegion, SubjectSpec, downscale, has_face
+# Importing the rule modules registers the built-in rules, in report order
 from .rule_of_thirds import analyze_rule_of_thirds
 from .horizon import analyze_horizon
 from .exposure import analyze_exposure
@@ -34,63 +40,140 @@ class CompositionAnalyzer:
 
     def __init__(self, genre: str = "portrait"):
         self.genre = genre
-        self.weights = self.GENRE_WEIGHTS.get(genre, self.GENRE_WEIGHTS["portrait"])
+        genre_weights = self.GENRE_WEIGHTS.get(genre, self.GENRE_WEIGHTS["portrait"])
+        # Registered rules without a genre-specific weight fall back to their default
+        self.weights = {
+            **{name: rule.default_weight for name, rule in RULES.items()},
+            **genre_weights
+        }
+
+    def active_rules(self) -> List[str]:
+        """Rules worth running for this genre, in report order
+
+        Rules weighted below `min_rule_weight` (or at zero) are skipped.
+        """
+        return [
+            name for name in RULES
+            if self.weights.get(name, 0) > 0 and self.weights[name] >= settings.min_rule_weight
+        ]
 
-    def analyze(self, image_path: str) -> Dict:
+    def analyze(
+        self,
+        image_path: str,
+        cancel: Optional[threading.Event] = None,
+        subject: Optional[SubjectSpec] = None
+    ) -> Dict:
         """
         Perform complete composition analysis
 
         Args:
             image_path: Path to the image file
+            cancel: Setting this event abandons the analysis (raises AnalysisCancelled)
+            subject: Subject box, mask or detection request (see `analyze_image`)
 
         Returns:
             Dict containing analysis results
         """
-        # Load image
-        image = cv2.imread(image_path)
+        # Load image upright, reading EXIF from the header only
+        image, exif = load_image(image_path)
         if image is None:
             raise ValueError(f"Failed to load image: {image_path}")
 
-        # Run all analyses
-        results = {
-            "rule_of_thirds": analyze_rule_of_thirds(image),
-            "horizon": analyze_horizon(image),
-            "exposure": analyze_exposure(image),
-            "sharpness": analyze_sharpness(image)
-        }
+        return self.analyze_image(image, exif, cancel, subject)
+
+    def analyze_preview(self, data: bytes) -> Dict:
+        """
+        Quick preliminary analysis of encoded image bytes
 
-        # Calculate weighted total score
-        total_score = sum(
-            results[rule]["score"] * self.weights[rule]
-            for rule in self.weights
+        Scores the embedded EXIF thumbnail when the file has one, otherwise a
+        1/8-scale JPEG decode. Scores are approximate: sharpness in particular
+        reads higher on a downscaled image.
+
+        Args:
+            data: Encoded image
+
+        Returns:
+            Dict containing analysis results plus `source` and `elapsed_ms`
+        """
+        start = time.perf_counter()
+        exif = parse_exif(data)
+        image, source = decode_thumbnail(exif), "exif_thumbnail"
+        if image is None:
+            image, _ = decode_image(data, reduce=8)
+            source = "reduced_decode"
+        if image is None:
+            raise ValueError("Failed to decode image")
+
+        result = self.analyze_image(image, exif)
+        result["source"] = source
+        result["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return result
+
+    def analyze_image(
+        self,
+        image: np.ndarray,
+        exif: Optional[Dict] = None,
+        cancel: Optional[threading.Event] = None,
+        subject: Optional[SubjectSpec] = None
+    ) -> Dict:
+        """
+        Perform complete composition analysis on a decoded BGR image
+
+        With a subject, exposure and sharpness are measured on the
+        full-resolution subject crop, thirds placement is scored from the
+        subject's position, and the remaining rules see a frame downscaled to
+        `roi_frame_size`. If detection finds no subject the whole image is
+        analyzed as usual.
+
+        Args:
+            image: BGR image array, already upright
+            exif: Parsed EXIF (see `exif.parse_exif`), if available
+            cancel: Setting this event abandons the analysis (raises AnalysisCancelled)
+            subject: Subject box, mask or detection request
+
+        Returns:
+            Dict containing analysis results
+        """
+        # Run the active rules in parallel, sharing intermediates
+        results, timings, region = evaluate_rules(
+            image, self.active_rules(), exif, cancel, subject, self.genre
         )
+        return self.compose(image, results, timings, exif, subject, region)
+
+    def compose(
+        self,
+        image: np.ndarray,
+        results: Dict[str, Dict],
+        timings: Dict[str, float],
+        exif: Optional[Dict] = None,
+        subject: Optional[SubjectSpec] = None,
+        region: Optional[SubjectRegion] = None
+    ) -> Dict:
+        """
+        Weight rule results into this genre's score, guide and prompt
+
+        `results` may hold rules inactive for this genre (when shared
+        across genres); they are ignored.
+        """
+        active = [rule for rule in self.active_rules() if rule in results]
+        results = {rule: results[rule] for rule in active}
+
+        # Weighted mean over the rules that ran, so skipped rules and weights
+        # not summing to 1 (e.g. a new rule's default_weight) keep it within 0-100
+        active_weight = sum(self.weights[rule] for rule in active)
+        total_score = 0.0
+        if active_weight > 0:
+            total_score = sum(results[rule]["score"] * self.weights[rule] for rule in active) / active_weight
 
         # Build rule scores list
         rule_scores = [
             {
-                "name": "Rule of Thirds",
-                "score": results["rule_of_thirds"]["score"],
-                "message": results["rule_of_thirds"]["message"],
-                "suggestion": results["rule_of_thirds"]["suggestion"]
-            },
-            {
-                "name": "Horizon Level",
-                "score": results["horizon"]["score"],
-                "message": results["horizon"]["message"],
-                "suggestion": results["horizon"]["suggestion"]
-            },
-            {
-                "name": "Exposure",
-                "score": results["exposure"]["score"],
-                "message": results["exposure"]["message"],
-                "suggestion": results["exposure"]["suggestion"]
-            },
-            {
-                "name": "Sharpness",
-                "score": results["sharpness"]["score"],
-                "message": results["sharpness"]["message"],
-                "suggestion": results["sharpness"]["suggestion"]
+                "name": RULES[rule].display_name,
+                "score": results[rule]["score"],
+                "message": results[rule]["message"],
+                "suggestion": results[rule]["suggestion"]
             }
+            for rule in active
         ]
 
         # Generate coach guide (beginner-friendly explanation)
@@ -99,19 +182,25 @@ class CompositionAnalyzer:
         # Generate expert prompt for nano-banana
         expert_prompt = self._generate_expert_prompt(results, image.shape)
 
+        metadata = {
+            "image_size": {"width": image.shape[1], "height": image.shape[0]},
+            "weights": self.weights,
+            "raw_results": {
+                k: v["metadata"] for k, v in results.items() if "metadata" in v
+            },
+            "timings_ms": {k: round(v, 2) for k, v in timings.items()},
+            "exif": exif_summary(exif or {})
+        }
+        if subject:
+            metadata["subject"] = region.summary() if region is not None else None
+
         return {
             "total_score": round(total_score, 1),
             "genre": self.genre,
             "rules": rule_scores,
             "coach_guide": coach_guide,
             "expert_prompt": expert_prompt,
-            "metadata": {
-                "image_size": {"width": image.shape[1], "height": image.shape[0]},
-                "weights": self.weights,
-                "raw_results": {
-                    k: v["metadata"] for k, v in results.items() if "metadata" in v
-                }
-            }
+            "metadata": metadata
         }
 
     def _generate_coach_guide(self, total_score: float, results: Dict) -> str:
@@ -129,21 +218,21 @@ class CompositionAnalyzer:
         tips = [intro, ""]
 
         # Add specific tips based on low-scoring rules
-        if results["rule_of_thirds"]["score"] < 60:
+        if "rule_of_thirds" in results and results["rule_of_thirds"]["score"] < 60:
             tips.append("💡 **Rule of Thirds**: Imagine a 3×3 grid on your viewfinder. Try placing your main subject at one of the four intersection points instead of dead center. This creates more dynamic, interesting compositions.")
 
-        if results["horizon"]["score"] < 80 and results["horizon"]["metadata"].get("has_horizon"):
+        if "horizon" in results and results["horizon"]["score"] < 80 and results["horizon"]["metadata"].get("has_horizon"):
             angle = results["horizon"]["metadata"]["angle"]
             tips.append(f"🌅 **Horizon Level**: Your horizon is tilted {abs(angle):.1f}° to the {'right' if angle > 0 else 'left'}. Use your camera's grid overlay or level feature to keep horizons straight. Tilted horizons can make viewers feel uneasy.")
 
-        if results["exposure"]["score"] < 60:
+        if "exposure" in results and results["exposure"]["score"] < 60:
             meta = results["exposure"]["metadata"]
             if meta["shadow_clipping"] > 8:
                 tips.append("💡 **Exposure - Shadows**: Your shadows are too dark (clipping). Try increasing exposure or using fill light to reveal more detail in dark areas.")
             if meta["highlight_clipping"] > 8:
                 tips.append("☀️ **Exposure - Highlights**: Your bright areas are overexposed (blown out). Reduce exposure or use exposure compensation to preserve highlight details.")
 
-        if results["sharpness"]["score"] < 60:
+        if "sharpness" in results and results["sharpness"]["score"] < 60:
             tips.append("🔍 **Sharpness**: Your image appears soft or blurry. Make sure to:\n  - Focus carefully on your subject\n  - Use a faster shutter speed (1/focal_length minimum)\n  - Hold the camera steady or use a tripod\n  - Check if your lens is clean")
 
         if len(tips) == 2:  # Only intro, no specific tips
@@ -158,7 +247,7 @@ class CompositionAnalyzer:
         improvements = []
 
         # Rule of thirds adjustment
-        rot_score = results["rule_of_thirds"]["score"]
+        rot_score = results["rule_of_thirds"]["score"] if "rule_of_thirds" in results else 100
         if rot_score < 70:
             improvements.append(
                 "reframe composition to better align with rule of thirds, "
@@ -166,23 +255,24 @@ class CompositionAnalyzer:
             )
 
         # Horizon correction
-        horizon_data = results["horizon"]["metadata"]
+        horizon_data = results["horizon"]["metadata"] if "horizon" in results else {}
         if horizon_data.get("has_horizon") and abs(horizon_data["angle"]) > 1:
             angle = horizon_data["angle"]
             improvements.append(f"rotate image {-angle:.1f} degrees to level the horizon line")
 
         # Exposure adjustments
-        exp_meta = results["exposure"]["metadata"]
-        if exp_meta["shadow_clipping"] > 8:
-            improvements.append("lift shadows and recover detail in dark areas")
-        if exp_meta["highlight_clipping"] > 8:
-            improvements.append("reduce highlights and recover detail in bright areas")
-        if exp_meta["dynamic_range"] < 40:
-            improvements.append("increase contrast and dynamic range for more visual impact")
+        if "exposure" in results:
+            exp_meta = results["exposure"]["metadata"]
+            if exp_meta["shadow_clipping"] > 8:
+                improvements.append("lift shadows and recover detail in dark areas")
+            if exp_meta["highlight_clipping"] > 8:
+                improvements.append("reduce highlights and recover detail in bright areas")
+            if exp_meta["dynamic_range"] < 40:
+                improvements.append("increase contrast and dynamic range for more visual impact")
 
         # Sharpness enhancement
-        sharp_meta = results["sharpness"]["metadata"]
-        if results["sharpness"]["score"] < 70:
+        if "sharpness" in results and results["sharpness"]["score"] < 70:
+            sharp_meta = results["sharpness"]["metadata"]
             if sharp_meta["quality"] in ["poor", "moderate"]:
                 improvements.append("enhance sharpness and clarity, add micro-contrast to bring out details")
 
@@ -207,6 +297,212 @@ class CompositionAnalyzer:
         return prompt
 
 
+def evaluate_rules(
+    image: np.ndarray,
+    rules: List[str],
+    exif: Optional[Dict] = None,
+    cancel: Optional[threading.Event] = None,
+    subject: Optional[SubjectSpec] = None,
+    genre: str = "portrait"
+) -> Tuple[Dict[str, Dict], Dict[str, float], Optional[SubjectRegion]]:
+    """
+    Run rules once, on the subject region when one is requested
+
+    Args:
+        image: BGR image array, already upright
+        rules: Rule names to run
+        exif: Parsed EXIF, if available
+        cancel: Setting this event abandons the analysis
+        subject: Subject box, mask or detection request
+        genre: Selects the subject detector
+
+    Returns:
+        (results, timings in ms, resolved subject region or None)
+    """
+    region = None
+    if subject:
+        frame = downscale(image, settings.roi_frame_size)
+        region = subject.resolve(image, frame, genre)
+        if region is not None:
+            results, timings = evaluate_region(image, frame, region, rules, exif, cancel)
+            return results, timings, region
+
+    results, timings = run_rules(image, rules, extras={"exif": exif or {}}, cancel=cancel)
+    return results, timings, region
+
+
+def evaluate_region(
+    image: np.ndarray,
+    frame: np.ndarray,
+    region: SubjectRegion,
+    rules: List[str],
+    exif: Optional[Dict] = None,
+    cancel: Optional[threading.Event] = None
+) -> Tuple[Dict[str, Dict], Dict[str, float]]:
+    """Run rules with subject rules on the region's full-resolution crop and the rest on `frame`"""
+    return run_rules(
+        frame,
+        rules,
+        extras={"exif": exif or {}, "subject": region.normalized(image.shape)},
+        cancel=cancel,
+        subject_image=region.crop(image),
+        subject_extras={"mask": region.mask, "frame_shape": image.shape[:2]}
+    )
+
+
+# Rules whose whole-frame results feed `recommend_genre`
+RECOMMENDATION_RULES = ["rule_of_thirds", "horizon", "exposure", "sharpness"]
+
+
+def recommend_genre(results: Dict[str, Dict], shape: tuple, face: bool = False) -> Dict:
+    """
+    Guess the photo's genre from raw rule results
+
+    Evidence is tallied per genre: a detected face or a vertical frame
+    suggests a portrait; a detected horizon or a wide frame a landscape; a
+    bright, evenly lit background with a sharp centered subject a product
+    shot. Portrait wins ties, matching the API default.
+
+    Args:
+        results: Raw results of RECOMMENDATION_RULES on the whole frame
+        shape: Image shape
+        face: Whether a face was found in the photo
+
+    Returns:
+        Dict with genre, confidence (share of the evidence) and reasons
+    """
+    height, width = shape[:2]
+    aspect = width / height
+    evidence = {genre: [] for genre in CompositionAnalyzer.GENRE_WEIGHTS}
+
+    def add(genre: str, weight: float, reason: str):
+        evidence[genre].append((weight, reason))
+
+    if face:
+        add("portrait", 3, "face detected")
+    if aspect < 0.9:
+        add("portrait", 1, "vertical frame")
+
+    horizon = results.get("horizon", {}).get("metadata", {})
+    if horizon.get("has_horizon"):
+        add("landscape", 2, "horizon line detected")
+    if aspect >= 1.5:
+        add("landscape", 1, "wide frame")
+
+    exposure = results.get("exposure", {}).get("metadata", {})
+    if exposure.get("mean_brightness", 0) >= 150 and exposure.get("shadow_clipping", 100) < 2:
+        add("product", 1, "bright, evenly lit background")
+    sharpness = results.get("sharpness", {}).get("metadata", {})
+    thirds = results.get("rule_of_thirds", {})
+    if sharpness.get("quality") in ("excellent", "good") and thirds.get("score", 100) < 40:
+        add("product", 1, "sharp, centered subject")
+
+    totals = {genre: sum(weight for weight, _ in items) for genre, items in evidence.items()}
+    genre = max(totals, key=lambda g: (totals[g], g == "portrait"))
+    overall = sum(totals.values())
+    return {
+        "genre": genre,
+        "confidence": round(totals[genre] / overall, 2) if overall else 0.0,
+        "reasons": [reason for _, reason in evidence[genre]]
+    }
+
+
+def analyze_genres_image(
+    image: np.ndarray,
+    genres: Optional[List[str]] = None,
+    exif: Optional[Dict] = None,
+    cancel: Optional[threading.Event] = None,
+    subject: Optional[SubjectSpec] = None
+) -> Dict:
+    """
+    Score one image for several genres, running each rule once
+
+    With subject detection, genres whose detectors find different regions
+    (a portrait's face versus the salient region) get separate rule passes,
+    so each genre scores as `analyze_image` would alone. The recommendation
+    is inferred from the downscaled whole frame, never a subject crop, so it
+    does not depend on which subject options were sent.
+
+    Args:
+        image: BGR image array, already upright
+        genres: Genres to score (default: all)
+        exif: Parsed EXIF, if available
+        cancel: Setting this event abandons the analysis
+        subject: Subject box, mask or detection request
+
+    Returns:
+        Dict with per-genre `results` (as `analyze_image` returns them) and
+        a `recommendation` from `recommend_genre`
+    """
+    genres = genres or list(CompositionAnalyzer.GENRE_WEIGHTS)
+    analyzers = [CompositionAnalyzer(genre) for genre in genres]
+    frame = downscale(image, settings.roi_frame_size)
+
+    # Resolve the subject once per detector, then group genres by region
+    regions: Dict[str, Optional[SubjectRegion]] = {}
+    groups: Dict[Optional[Tuple[int, ...]], List[CompositionAnalyzer]] = {}
+    for analyzer in analyzers:
+        region = None
+        if subject:
+            detector = subject.detector(analyzer.genre)
+            if detector not in regions:
+                regions[detector] = subject.resolve(image, frame, analyzer.genre)
+            region = regions[detector]
+        groups.setdefault(region.box if region is not None else None, []).append(analyzer)
+
+    composed, whole_results, face = {}, None, False
+    for group in groups.values():
+        # Union of the group's active rules, kept in report order
+        needed = {rule for analyzer in group for rule in analyzer.active_rules()}
+        rules = [rule for rule in RULES if rule in needed]
+        region = None
+        if subject:
+            region = regions[subject.detector(group[0].genre)]
+        if region is None:
+            results, timings = run_rules(image, rules, extras={"exif": exif or {}}, cancel=cancel)
+        else:
+            results, timings = evaluate_region(image, frame, region, rules, exif, cancel)
+            face = face or region.source == "face"
+        for analyzer in group:
+            composed[analyzer.genre] = analyzer.compose(image, results, timings, exif, subject, region)
+        if region is None:
+            whole_results = results
+
+    # Genre evidence comes from the whole frame; a small image is its own
+    # frame, so a whole-image pass can be reused. Both this and the face
+    # cascade are cheap next to the full-resolution rules
+    if frame is not image or whole_results is None \
+            or not all(rule in whole_results for rule in RECOMMENDATION_RULES):
+        whole_results, _ = run_rules(frame, RECOMMENDATION_RULES, extras={"exif": exif or {}}, cancel=cancel)
+    face = face or has_face(frame)
+    return {
+        "results": {genre: composed[genre] for genre in genres},
+        "recommendation": recommend_genre(whole_results, image.shape, face)
+    }
+
+
+def analyze_genres(
+    image_path: str,
+    genres: Optional[List[str]] = None,
+    cancel: Optional[threading.Event] = None,
+    subject: Optional[SubjectSpec] = None
+) -> Dict:
+    """
+    Convenience function scoring an image file for several genres
+
+    Args:
+        image_path: Path to image file
+        genres: Genres to score (default: all)
+
+    Returns:
+        See `analyze_genres_image`
+    """
+    image, exif = load_image(image_path)
+    if image is None:
+        raise ValueError(f"Failed to load image: {image_path}")
+    return analyze_genres_image(image, genres, exif, cancel, subject)
+
+
 def analyze_composition(image_path: str, genre: str = "portrait") -> Dict:
     """
     Convenience function for analyzing composition
@@ -0,0 +1,219 @@
+import struct
+import cv2
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+
+# TIFF tags read from IFD0, the Exif sub-IFD and IFD1
+TAG_ORIENTATION = 0x0112
+TAG_EXIF_IFD = 0x8769
+TAG_EXPOSURE_TIME = 0x829A
+TAG_F_NUMBER = 0x829D
+TAG_ISO = 0x8827
+TAG_FOCAL_LENGTH = 0x920A
+TAG_FOCAL_LENGTH_35MM = 0xA405
+TAG_THUMBNAIL_OFFSET = 0x0201
+TAG_THUMBNAIL_LENGTH = 0x0202
+
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+
+HEADER_READ_SIZE = 64 * 1024
+MAX_HEADER_SIZE = 1024 * 1024  # give up on files with more metadata than this before APP1
+
+
+def _find_app1(data: bytes) -> Tuple[Optional[int], Optional[int]]:
+    """Return (start, end) of the Exif APP1 payload, or (None, needed_bytes) if truncated"""
+    if data[:2] != b"\xff\xd8":
+        return None, None
+
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None, None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        if marker in (0xDA, 0xD9):  # image data starts; no Exif before it
+            return None, None
+
+        length = struct.unpack(">H", data[pos + 2:pos + 4])[0]
+        end = pos + 2 + length
+        if marker == 0xE1 and data[pos + 4:pos + 10] == b"Exif\x00\x00":
+            if end > len(data):
+                return None, end
+            return pos + 10, end
+        pos = end
+
+    # Ran out of data between segments; the next header is past the buffer
+    return None, pos + 4
+
+
+def _read_ifd(tiff: bytes, offset: int, endian: str) -> Tuple[Dict[int, object], int]:
+    """Read single-valued entries of one IFD; returns (tags, next IFD offset)"""
+    count = struct.unpack(endian + "H", tiff[offset:offset + 2])[0]
+    tags = {}
+    for i in range(count):
+        entry = offset + 2 + i * 12
+        tag, typ, n = struct.unpack(endian + "HHI", tiff[entry:entry + 8])
+        size = TYPE_SIZES.get(typ)
+        if size is None or n == 0:
+            continue
+        value_at = entry + 8
+        if size * n > 4:
+            value_at = struct.unpack(endian + "I", tiff[entry + 8:entry + 12])[0]
+
+        if typ == 3:
+            tags[tag] = struct.unpack(endian + "H", tiff[value_at:value_at + 2])[0]
+        elif typ in (4, 9):
+            tags[tag] = struct.unpack(endian + ("I" if typ == 4 else "i"), tiff[value_at:value_at + 4])[0]
+        elif typ in (5, 10):
+            num, den = struct.unpack(endian + ("II" if typ == 5 else "ii"), tiff[value_at:value_at + 8])
+            tags[tag] = num / den if den else 0.0
+
+    next_at = offset + 2 + count * 12
+    next_ifd = struct.unpack(endian + "I", tiff[next_at:next_at + 4])[0]
+    return tags, next_ifd
+
+
+def parse_exif(data: bytes) -> Dict:
+    """
+    Parse the EXIF fields the analyzers use from JPEG header bytes
+
+    Only the APP1 segment is examined, so `data` can be just the first few
+    kilobytes of the file. Returns an empty dict for non-JPEG data or files
+    without EXIF; malformed EXIF yields whatever was read before the error.
+
+    Returns:
+        Dict with any of: orientation, exposure_time (s), f_number, iso,
+        focal_length (mm), focal_length_35mm (mm), thumbnail (JPEG bytes)
+    """
+    start, end = _find_app1(data)
+    if start is None:
+        return {}
+
+    tiff = data[start:end]
+    exif: Dict = {}
+    try:
+        endian = {b"II": "<", b"MM": ">"}[tiff[:2]]
+        ifd0, next_ifd = _read_ifd(tiff, struct.unpack(endian + "I", tiff[4:8])[0], endian)
+        if TAG_ORIENTATION in ifd0:
+            exif["orientation"] = int(ifd0[TAG_ORIENTATION])
+
+        if TAG_EXIF_IFD in ifd0:
+            sub, _ = _read_ifd(tiff, int(ifd0[TAG_EXIF_IFD]), endian)
+            for tag, key in (
+                (TAG_EXPOSURE_TIME, "exposure_time"),
+                (TAG_F_NUMBER, "f_number"),
+                (TAG_ISO, "iso"),
+                (TAG_FOCAL_LENGTH, "focal_length"),
+                (TAG_FOCAL_LENGTH_35MM, "focal_length_35mm")
+            ):
+                if sub.get(tag):
+                    exif[key] = sub[tag]
+
+        if next_ifd:
+            ifd1, _ = _read_ifd(tiff, next_ifd, endian)
+            offset = ifd1.get(TAG_THUMBNAIL_OFFSET)
+            length = ifd1.get(TAG_THUMBNAIL_LENGTH)
+            if offset and length and offset + length <= len(tiff):
+                exif["thumbnail"] = tiff[offset:offset + length]
+    except (KeyError, struct.error):
+        pass
+
+    return exif
+
+
+def read_exif(image_path: str) -> Dict:
+    """Parse EXIF from a file, reading only its header bytes"""
+    with open(image_path, "rb") as f:
+        data = f.read(HEADER_READ_SIZE)
+        while True:
+            start, needed = _find_app1(data)
+            # Stop once APP1 is complete, or when there is no bounded amount left to read
+            if start is not None or not needed or needed > MAX_HEADER_SIZE:
+                break
+            more = f.read(max(needed - len(data), 4096))
+            if not more:
+                break
+            data += more
+    return parse_exif(data)
+
+
+def exif_summary(exif: Dict) -> Dict:
+    """EXIF fields suitable for JSON metadata (drops the thumbnail bytes)"""
+    summary = {k: v for k, v in exif.items() if k != "thumbnail"}
+    if "thumbnail" in exif:
+        summary["thumbnail_bytes"] = len(exif["thumbnail"])
+    return summary
+
+
+def apply_orientation(image: np.ndarray, orientation: int) -> np.ndarray:
+    """Rotate/flip a decoded image to its EXIF display orientation (1-8)"""
+    if orientation == 2:
+        return cv2.flip(image, 1)
+    if orientation == 3:
+        return cv2.flip(image, -1)
+    if orientation == 4:
+        return cv2.flip(image, 0)
+    if orientation == 5:
+        return cv2.transpose(image)
+    if orientation == 6:
+        return cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
+    if orientation == 7:
+        return cv2.flip(cv2.transpose(image), -1)
+    if orientation == 8:
+        return cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return image
+
+
+def load_image(image_path: str) -> Tuple[Optional[np.ndarray], Dict]:
+    """
+    Decode an image upright, with its EXIF
+
+    Decodes without OpenCV's own orientation handling and applies the
+    orientation parsed from the header, so full images, thumbnails and
+    reduced decodes are all rotated the same way.
+    """
+    exif = read_exif(image_path)
+    image = cv2.imread(image_path, cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+    if image is None:
+        return None, exif
+    return apply_orientation(image, exif.get("orientation", 1)), exif
+
+
+def decode_image(data: bytes, reduce: int = 1) -> Tuple[Optional[np.ndarray], Dict]:
+    """
+    Decode image bytes upright, with their EXIF
+
+    Args:
+        data: Encoded image
+        reduce: 1, 2, 4 or 8; JPEGs are decoded directly at that fraction of
+            full size, which is much cheaper than decoding and resizing
+    """
+    flags = {
+        1: cv2.IMREAD_COLOR,
+        2: cv2.IMREAD_REDUCED_COLOR_2,
+        4: cv2.IMREAD_REDUCED_COLOR_4,
+        8: cv2.IMREAD_REDUCED_COLOR_8
+    }[reduce]
+    # Only segment headers are walked, so this stays cheap on large uploads
+    exif = parse_exif(data)
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), flags | cv2.IMREAD_IGNORE_ORIENTATION)
+    if image is None:
+        return None, exif
+    return apply_orientation(image, exif.get("orientation", 1)), exif
+
+
+def decode_thumbnail(exif: Dict) -> Optional[np.ndarray]:
+    """Decode the embedded EXIF preview thumbnail, upright, if there is one"""
+    thumbnail = exif.get("thumbnail")
+    if not thumbnail:
+        return None
+    image = cv2.imdecode(np.frombuffer(thumbnail, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+    return apply_orientation(image, exif.get("orientation", 1))
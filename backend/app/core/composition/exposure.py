@@ -1,19 +1,26 @@
 import cv2
 import numpy as np
-from typing import Dict
+from typing import Dict, Optional
+from .registry import register_rule
 
 
-def analyze_exposure(image: np.ndarray) -> Dict:
+@register_rule("exposure", "Exposure", requires={"hist": "histogram"}, region="subject")
+def analyze_exposure(image: np.ndarray, hist: Optional[np.ndarray] = None) -> Dict:
     """
     Analyze image exposure using histogram analysis
 
     Checks for clipping (over/under exposure) and dynamic range
+
+    Args:
+        image: BGR image
+        hist: Precomputed 256-bin grayscale histogram, if available
     """
-    # Convert to grayscale for histogram analysis
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if hist is None:
+        # Convert to grayscale for histogram analysis
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
-    # Calculate histogram
-    hist = cv2.calcHist([gray], [0], None, [256], [0, 256])
+        # Calculate histogram
+        hist = cv2.calcHist([gray], [0], None, [256], [0, 256])
     hist = hist.flatten() / hist.sum()  # Normalize
 
     # Check for clipping in shadows (0-10) and highlights (245-255)
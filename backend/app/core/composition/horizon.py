@@ -1,25 +1,32 @@
 import cv2
 import numpy as np
-from typing import Dict
+from typing import Dict, Optional
+from .registry import register_rule
 
 
-def analyze_horizon(image: np.ndarray) -> Dict:
+@register_rule("horizon", "Horizon Level", requires={"edges": "blurred_edges"})
+def analyze_horizon(image: np.ndarray, edges: Optional[np.ndarray] = None) -> Dict:
     """
     Analyze horizon line straightness
 
     Uses Hough Line Transform to detect horizontal lines
     and measure their angle deviation
+
+    Args:
+        image: BGR image
+        edges: Precomputed Canny edges of the blurred grayscale image, if available
     """
     height, width = image.shape[:2]
 
-    # Convert to grayscale
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if edges is None:
+        # Convert to grayscale
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
-    # Apply Gaussian blur to reduce noise
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+        # Apply Gaussian blur to reduce noise
+        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
 
-    # Detect edges
-    edges = cv2.Canny(blurred, 50, 150, apertureSize=3)
+        # Detect edges
+        edges = cv2.Canny(blurred, 50, 150, apertureSize=3)
 
     # Detect lines using Hough Transform
     lines = cv2.HoughLinesP(
@@ -0,0 +1,318 @@
+import os
+import threading
+import time
+import cv2
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from ..config import settings
+from ..runtime import configure_opencv
+
+configure_opencv()
+
+
+class AnalysisCancelled(Exception):
+    """Raised inside run_rules once its cancel event is set"""
+
+
+class Intermediate:
+    """A shared per-image computation (grayscale, edges, ...) that rules can depend on"""
+
+    def __init__(self, name: str, requires: Tuple[str, ...], compute: Callable):
+        self.name = name
+        self.requires = requires
+        self.compute = compute
+
+
+class Rule:
+    """A composition rule and the intermediates it consumes"""
+
+    def __init__(
+        self,
+        name: str,
+        display_name: str,
+        requires: Dict[str, str],
+        func: Callable,
+        default_weight: float,
+        region: str = "frame"
+    ):
+        self.name = name
+        self.display_name = display_name
+        self.requires = requires  # analyzer keyword argument -> intermediate name
+        self.func = func
+        self.default_weight = default_weight
+        self.region = region  # "frame" or "subject"
+
+
+INTERMEDIATES: Dict[str, Intermediate] = {}
+RULES: Dict[str, Rule] = {}
+
+
+def register_intermediate(name: str, requires: Tuple[str, ...] = ("image",)):
+    """
+    Register a function computing a shared intermediate from its dependencies
+
+    Dependencies are passed as keyword arguments named after them and must
+    already be registered, which keeps the dependency graph acyclic.
+    """
+    def decorator(func: Callable) -> Callable:
+        missing = [dep for dep in requires if dep != "image" and dep not in INTERMEDIATES]
+        if missing:
+            raise ValueError(f"Intermediate {name} depends on unregistered {missing}")
+        INTERMEDIATES[name] = Intermediate(name, tuple(requires), func)
+        return func
+    return decorator
+
+
+def register_rule(
+    name: str,
+    display_name: str,
+    requires: Optional[Dict[str, str]] = None,
+    default_weight: float = 0.0,
+    region: str = "frame"
+):
+    """
+    Register an analyzer function as a composition rule
+
+    The function is called as `func(image, **{kwarg: intermediate})` and must
+    return a dict with score, message, suggestion and metadata. Rules are
+    reported in registration order. `default_weight` applies to genres that
+    do not list the rule in `CompositionAnalyzer.GENRE_WEIGHTS`.
+
+    When a subject region is given, `region="subject"` rules run on the
+    full-resolution subject crop and `region="frame"` rules on a downscaled
+    copy of the whole image.
+    """
+    if region not in ("frame", "subject"):
+        raise ValueError(f"Rule {name} has unknown region {region!r}")
+    requires = requires or {}
+
+    def decorator(func: Callable) -> Callable:
+        missing = [dep for dep in requires.values() if dep not in INTERMEDIATES]
+        if missing:
+            raise ValueError(f"Rule {name} depends on unregistered {missing}")
+        RULES[name] = Rule(name, display_name, requires, func, default_weight, region)
+        return func
+    return decorator
+
+
+class FeatureContext:
+    """
+    Per-image cache of intermediates
+
+    Each intermediate is computed at most once, by whichever rule asks for it
+    first; rules needing it concurrently wait on its lock instead of
+    recomputing it.
+    """
+
+    def __init__(
+        self,
+        image: np.ndarray,
+        extras: Optional[Dict[str, object]] = None,
+        cancel: Optional[threading.Event] = None
+    ):
+        self.image = image
+        self.cancel = cancel
+        self.timings: Dict[str, float] = {}
+        # Extras supply intermediates that come from outside the pixels (e.g. EXIF)
+        self._values: Dict[str, object] = {**(extras or {}), "image": image}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def check_cancelled(self):
+        if self.cancel is not None and self.cancel.is_set():
+            raise AnalysisCancelled()
+
+    def get(self, name: str):
+        if name in self._values:
+            return self._values[name]
+
+        with self._guard:
+            lock = self._locks.setdefault(name, threading.Lock())
+
+        with lock:
+            if name not in self._values:
+                self.check_cancelled()
+                spec = INTERMEDIATES[name]
+                deps = {dep: self.get(dep) for dep in spec.requires}
+                start = time.perf_counter()
+                self._values[name] = spec.compute(**deps)
+                self.timings[name] = (time.perf_counter() - start) * 1000
+        return self._values[name]
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Shared pool for rule execution; OpenCV releases the GIL so rules run in parallel"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = settings.analysis_threads or min(4, os.cpu_count() or 1)
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rule")
+    return _executor
+
+
+def _run_rule(rule: Rule, ctx: FeatureContext) -> Tuple[Dict, float]:
+    ctx.check_cancelled()
+    start = time.perf_counter()
+    kwargs = {kwarg: ctx.get(dep) for kwarg, dep in rule.requires.items()}
+    result = rule.func(ctx.image, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def run_rules(
+    image: np.ndarray,
+    names: List[str],
+    extras: Optional[Dict[str, object]] = None,
+    cancel: Optional[threading.Event] = None,
+    subject_image: Optional[np.ndarray] = None,
+    subject_extras: Optional[Dict[str, object]] = None
+) -> Tuple[Dict[str, Dict], Dict[str, float]]:
+    """
+    Run the named rules on an image in parallel, sharing intermediates
+
+    Args:
+        image: BGR image
+        names: Rules to run
+        extras: Precomputed intermediates, e.g. {"exif": {...}}
+        cancel: Once set, rules and intermediates not yet started are skipped
+            and AnalysisCancelled is raised
+        subject_image: Subject crop for `region="subject"` rules; they use
+            `image` when not given
+        subject_extras: Precomputed intermediates for the subject crop
+
+    Returns:
+        (results keyed by rule name, timings in ms keyed by rule and intermediate name)
+    """
+    ctx = FeatureContext(image, extras, cancel)
+    subject_ctx = ctx
+    if subject_image is not None:
+        subject_ctx = FeatureContext(subject_image, {**(extras or {}), **(subject_extras or {})}, cancel)
+    contexts = {"frame": ctx, "subject": subject_ctx}
+
+    def intermediate_timings() -> Dict[str, float]:
+        if subject_ctx is ctx:
+            return ctx.timings
+        return {**ctx.timings, **{f"subject.{k}": v for k, v in subject_ctx.timings.items()}}
+
+    if len(names) == 1:
+        rule = RULES[names[0]]
+        result, elapsed = _run_rule(rule, contexts[rule.region])
+        return {names[0]: result}, {**intermediate_timings(), names[0]: elapsed}
+
+    executor = get_executor()
+    futures = {
+        name: executor.submit(_run_rule, RULES[name], contexts[RULES[name].region])
+        for name in names
+    }
+
+    results, timings = {}, {}
+    try:
+        for name, future in futures.items():
+            results[name], timings[name] = future.result()
+    except AnalysisCancelled:
+        for future in futures.values():
+            future.cancel()
+        raise
+    return results, {**intermediate_timings(), **timings}
+
+
+# Built-in intermediates shared by the standard rules
+
+def _src(array: np.ndarray):
+    """Wrap an input in cv2.UMat when the transparent API path is enabled"""
+    return cv2.UMat(array) if settings.opencv_use_umat else array
+
+
+def _mat(result) -> np.ndarray:
+    """Rules index and reduce with NumPy, so always hand back an ndarray"""
+    return result.get() if isinstance(result, cv2.UMat) else result
+
+
+@register_intermediate("exif")
+def _exif(image: np.ndarray) -> Dict:
+    # Placeholder: callers with header metadata pass it through run_rules extras
+    return {}
+
+
+@register_intermediate("mask")
+def _mask(image: np.ndarray) -> Optional[np.ndarray]:
+    # Subject mask, supplied through extras when the caller has one
+    return None
+
+
+@register_intermediate("subject")
+def _subject(image: np.ndarray) -> Optional[Dict]:
+    # Normalized subject box and center, supplied through extras
+    return None
+
+
+@register_intermediate("frame_shape")
+def _frame_shape(image: np.ndarray) -> Tuple[int, int]:
+    # (height, width) of the whole photo; differs from the image for subject crops
+    return image.shape[:2]
+
+
+@register_intermediate("gray")
+def _gray(image: np.ndarray) -> np.ndarray:
+    return _mat(cv2.cvtColor(_src(image), cv2.COLOR_BGR2GRAY))
+
+
+@register_intermediate("edges", requires=("gray",))
+def _edges(gray: np.ndarray) -> np.ndarray:
+    return _mat(cv2.Canny(_src(gray), 50, 150))
+
+
+@register_intermediate("blurred", requires=("gray",))
+def _blurred(gray: np.ndarray) -> np.ndarray:
+    return _mat(cv2.GaussianBlur(_src(gray), (5, 5), 0))
+
+
+@register_intermediate("blurred_edges", requires=("blurred",))
+def _blurred_edges(blurred: np.ndarray) -> np.ndarray:
+    return _mat(cv2.Canny(_src(blurred), 50, 150, apertureSize=3))
+
+
+@register_intermediate("histogram", requires=("gray", "mask"))
+def _histogram(gray: np.ndarray, mask: Optional[np.ndarray]) -> np.ndarray:
+    return cv2.calcHist([gray], [0], mask, [256], [0, 256])
+
+
+# There is deliberately no full "laplacian" intermediate: the float64
+# image costs 8 bytes per pixel (192MB at 24MP); rules use these stats
+@register_intermediate("laplacian_stats", requires=("gray",))
+def laplacian_stats(gray: np.ndarray) -> Tuple[float, Tuple[int, int]]:
+    """
+    Variance of the CV_64F Laplacian and the image shape, without the full float64 image
+
+    The Laplacian is computed in horizontal strips of `laplacian_strip_rows`,
+    each with one row of context above and below so edge rows match the
+    whole-image result, and strip variances are combined exactly (Chan et
+    al.). Only one float64 strip is held at a time instead of 8 bytes per
+    pixel.
+    """
+    height, width = gray.shape
+    rows = settings.laplacian_strip_rows
+    if rows <= 0 or rows >= height:
+        return float(cv2.Laplacian(gray, cv2.CV_64F).var()), (height, width)
+
+    strip_buffer = np.empty((rows + 2, width), np.float64)
+    count, mean, m2 = 0, 0.0, 0.0
+    for y0 in range(0, height, rows):
+        y1 = min(height, y0 + rows)
+        top, bottom = max(0, y0 - 1), min(height, y1 + 1)
+        out = strip_buffer[:bottom - top]
+        cv2.Laplacian(gray[top:bottom], cv2.CV_64F, dst=out)
+        strip = out[y0 - top:y1 - top]
+
+        n = strip.size
+        delta = float(strip.mean()) - mean
+        total = count + n
+        mean += delta * n / total
+        m2 += float(strip.var()) * n + delta * delta * count * n / total
+        count = total
+    return m2 / count, (height, width)
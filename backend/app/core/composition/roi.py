@@ -0,0 +1,232 @@
+import threading
+import cv2
+import numpy as np
+from typing import Dict, Optional, Tuple
+from ..config import settings
+
+
+class SubjectError(ValueError):
+    """Invalid subject box or mask"""
+
+
+class SubjectRegion:
+    """
+    The subject of a photo: a bounding box in full-resolution pixels
+
+    Args:
+        box: (x, y, width, height) within the upright image
+        source: box, mask, face or saliency
+        mask: Optional uint8 mask the size of the box (non-zero = subject)
+    """
+
+    def __init__(self, box: Tuple[int, int, int, int], source: str, mask: Optional[np.ndarray] = None):
+        self.box = box
+        self.source = source
+        self.mask = mask
+
+    def crop(self, image: np.ndarray) -> np.ndarray:
+        """Full-resolution view of the region (no copy)"""
+        x, y, w, h = self.box
+        return image[y:y + h, x:x + w]
+
+    def normalized(self, shape: tuple) -> Dict:
+        """Box and center as fractions of the image size"""
+        height, width = shape[:2]
+        x, y, w, h = self.box
+        return {
+            "box": (x / width, y / height, w / width, h / height),
+            "center": ((x + w / 2) / width, (y + h / 2) / height)
+        }
+
+    def summary(self) -> Dict:
+        summary = {"box": list(self.box), "source": self.source}
+        if self.mask is not None:
+            summary["mask_coverage"] = round(float(np.count_nonzero(self.mask)) / self.mask.size, 3)
+        return summary
+
+
+def parse_box(spec: str) -> Tuple[float, float, float, float]:
+    """Parse "x,y,w,h"; values all within 0-1 are read as fractions of the image"""
+    try:
+        values = tuple(float(v) for v in spec.split(","))
+    except ValueError:
+        raise SubjectError(f"Invalid subject box {spec!r}; expected x,y,w,h")
+    if len(values) != 4 or values[2] <= 0 or values[3] <= 0 or min(values) < 0:
+        raise SubjectError(f"Invalid subject box {spec!r}; expected x,y,w,h")
+    return values
+
+
+def _clip_box(
+    box: Tuple[float, float, float, float],
+    width: int,
+    height: int,
+    fractional: bool = False
+) -> Tuple[int, int, int, int]:
+    x, y, w, h = box
+    if fractional:
+        x, y, w, h = x * width, y * height, w * width, h * height
+    x1, y1 = max(0, int(round(x))), max(0, int(round(y)))
+    x2, y2 = min(width, int(round(x + w))), min(height, int(round(y + h)))
+    if x2 - x1 < settings.roi_min_size or y2 - y1 < settings.roi_min_size:
+        raise SubjectError("Subject box is outside the image or too small")
+    return x1, y1, x2 - x1, y2 - y1
+
+
+def region_from_mask(mask: np.ndarray, width: int, height: int) -> SubjectRegion:
+    """Bounding box of a subject mask, resized to the image if needed"""
+    if mask.shape[:2] != (height, width):
+        mask = cv2.resize(mask, (width, height), interpolation=cv2.INTER_NEAREST)
+    points = cv2.findNonZero((mask > 127).astype(np.uint8))
+    if points is None:
+        raise SubjectError("Subject mask is empty")
+    x, y, w, h = _clip_box(cv2.boundingRect(points), width, height)
+    return SubjectRegion((x, y, w, h), "mask", (mask[y:y + h, x:x + w] > 127).astype(np.uint8) * 255)
+
+
+_cascades = threading.local()
+
+
+def _face_cascade() -> cv2.CascadeClassifier:
+    # CascadeClassifier is not safe to share across threads
+    cascade = getattr(_cascades, "face", None)
+    if cascade is None:
+        cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+        _cascades.face = cascade
+    return cascade
+
+
+def detect_face(gray: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+    """Largest frontal face in a small grayscale image, widened to head and shoulders"""
+    faces = _face_cascade().detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(24, 24))
+    if len(faces) == 0:
+        return None
+    x, y, w, h = max(faces, key=lambda f: f[2] * f[3])
+    # The cascade box is tight around the eyes and mouth
+    return x - w * 0.25, y - h * 0.25, w * 1.5, h * 1.6
+
+
+def detect_salient(gray: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Bounding box of the most salient region (spectral residual saliency)
+
+    Works on a 64px-wide copy, so the cost is independent of image size.
+    """
+    height, width = gray.shape[:2]
+    scale = 64 / width
+    small = cv2.resize(gray, (64, max(8, int(height * scale))), interpolation=cv2.INTER_AREA)
+
+    spectrum = np.fft.fft2(small.astype(np.float32))
+    log_amplitude = np.log(np.abs(spectrum) + 1e-8)
+    residual = log_amplitude - cv2.blur(log_amplitude, (3, 3))
+    saliency = np.abs(np.fft.ifft2(np.exp(residual + 1j * np.angle(spectrum)))) ** 2
+    saliency = cv2.GaussianBlur(saliency.astype(np.float32), (9, 9), 2.5)
+
+    binary = (saliency > saliency.mean() * 3).astype(np.uint8)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary)
+    if count < 2:
+        return None
+    # Largest component, skipping the background label
+    label = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+    x, y, w, h = stats[label, :4]
+    return x / scale, y / scale, w / scale, h / scale
+
+
+def _detection_gray(frame: np.ndarray) -> np.ndarray:
+    """Grayscale copy with the longer side at most `roi_detect_size`"""
+    height, width = frame.shape[:2]
+    scale = min(1.0, settings.roi_detect_size / max(width, height))
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if scale < 1:
+        gray = cv2.resize(gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    return gray
+
+
+def has_face(frame: np.ndarray) -> bool:
+    """Whether the face cascade finds a frontal face in a downscaled frame"""
+    return detect_face(_detection_gray(frame)) is not None
+
+
+def detect_subject(frame: np.ndarray, genre: str) -> Optional[Tuple[Tuple[float, ...], str]]:
+    """
+    Cheap CPU-only subject detection on a downscaled frame
+
+    Portraits try the bundled Haar face cascade first; everything else (and
+    portraits without a detectable face) uses spectral residual saliency.
+
+    Returns:
+        ((x, y, w, h) as fractions of the frame, "face" or "saliency"), or None
+    """
+    gray = _detection_gray(frame)
+    box = detect_face(gray) if genre == "portrait" else None
+    if box is not None:
+        source = "face"
+    else:
+        box, source = detect_salient(gray), "saliency"
+    if box is None:
+        return None
+
+    small_h, small_w = gray.shape[:2]
+    x, y, w, h = box
+    return (x / small_w, y / small_h, w / small_w, h / small_h), source
+
+
+class SubjectSpec:
+    """
+    What the caller asked for: an explicit box, a mask, or detection
+
+    Resolved against the decoded, upright image by `resolve`.
+    """
+
+    def __init__(self, box: Optional[str] = None, mask: Optional[bytes] = None, detect: bool = False):
+        self.box = parse_box(box) if box else None
+        self.mask = mask
+        self.detect = detect
+
+    def __bool__(self) -> bool:
+        return bool(self.box or self.mask or self.detect)
+
+    def detector(self, genre: str) -> str:
+        """Key for how `resolve` finds the region; genres sharing it get the same region"""
+        if self.mask or self.box:
+            return "given"
+        return "face" if genre == "portrait" else "saliency"
+
+    def resolve(self, image: np.ndarray, frame: np.ndarray, genre: str) -> Optional[SubjectRegion]:
+        """
+        Args:
+            image: Full-resolution upright image
+            frame: Downscaled copy used for detection
+            genre: Photo genre, selects the detector
+
+        Returns:
+            The subject region, or None if detection found nothing
+        """
+        height, width = image.shape[:2]
+        if self.mask:
+            mask = cv2.imdecode(np.frombuffer(self.mask, np.uint8), cv2.IMREAD_GRAYSCALE)
+            if mask is None:
+                raise SubjectError("Failed to decode subject mask")
+            return region_from_mask(mask, width, height)
+
+        if self.box:
+            fractional = max(self.box) <= 1
+            return SubjectRegion(_clip_box(self.box, width, height, fractional), "box")
+
+        detected = detect_subject(frame, genre)
+        if detected is None:
+            return None
+        box, source = detected
+        try:
+            return SubjectRegion(_clip_box(box, width, height, fractional=True), source)
+        except SubjectError:
+            return None
+
+
+def downscale(image: np.ndarray, max_side: int) -> np.ndarray:
+    """Area-downscale so the longer side is at most max_side"""
+    height, width = image.shape[:2]
+    scale = max_side / max(width, height)
+    if scale >= 1:
+        return image
+    size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
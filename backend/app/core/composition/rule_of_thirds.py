@@ -1,14 +1,44 @@
 import cv2
 import numpy as np
-from typing import Tuple, Dict
+from typing import Tuple, Dict, Optional
+from .registry import register_rule
 
 
-def analyze_rule_of_thirds(image: np.ndarray) -> Dict:
+def _subject_placement(subject: Dict) -> Tuple[float, Dict]:
+    """Score how close the subject's center sits to the nearest power point"""
+    cx, cy = subject["center"]
+    nearest = min(
+        ((px, py) for px in (1 / 3, 2 / 3) for py in (1 / 3, 2 / 3)),
+        key=lambda p: (p[0] - cx) ** 2 + (p[1] - cy) ** 2
+    )
+    distance = float(np.hypot(nearest[0] - cx, nearest[1] - cy))
+
+    # Full marks on a power point, zero a quarter of the frame away
+    score = max(0.0, 100 * (1 - distance / 0.25))
+    return score, {
+        "subject_center": [round(cx, 3), round(cy, 3)],
+        "nearest_power_point": [round(nearest[0], 3), round(nearest[1], 3)],
+        "subject_distance": round(distance, 3)
+    }
+
+
+@register_rule("rule_of_thirds", "Rule of Thirds", requires={"edges": "edges", "subject": "subject"})
+def analyze_rule_of_thirds(
+    image: np.ndarray,
+    edges: Optional[np.ndarray] = None,
+    subject: Optional[Dict] = None
+) -> Dict:
     """
     Analyze Rule of Thirds composition
 
     Checks if important visual elements are near the intersection points
     of the 3x3 grid (power points)
+
+    Args:
+        image: BGR image
+        edges: Precomputed Canny edges of the grayscale image, if available
+        subject: Normalized subject box and center; when given, the subject's
+            placement is scored instead of edge density
     """
     height, width = image.shape[:2]
 
@@ -22,32 +52,41 @@ def analyze_rule_of_thirds(image: np.ndarray) -> Dict:
         (2 * third_x, 2 * third_y)
     ]
 
-    # Convert to grayscale for edge detection
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if subject is not None:
+        score, metadata = _subject_placement(subject)
+        metadata["power_points"] = power_points
+    else:
+        if edges is None:
+            # Convert to grayscale for edge detection
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
-    # Detect edges using Canny
-    edges = cv2.Canny(gray, 50, 150)
+            # Detect edges using Canny
+            edges = cv2.Canny(gray, 50, 150)
 
-    # Calculate interest points near power points
-    interest_scores = []
-    radius = min(width, height) // 10  # 10% of image size
+        # Calculate interest points near power points
+        interest_scores = []
+        radius = min(width, height) // 10  # 10% of image size
 
-    for px, py in power_points:
-        # Extract region around power point
-        y1, y2 = max(0, py - radius), min(height, py + radius)
-        x1, x2 = max(0, px - radius), min(width, px + radius)
-        region = edges[y1:y2, x1:x2]
+        for px, py in power_points:
+            # Extract region around power point
+            y1, y2 = max(0, py - radius), min(height, py + radius)
+            x1, x2 = max(0, px - radius), min(width, px + radius)
+            region = edges[y1:y2, x1:x2]
 
-        # Calculate edge density (interest level)
-        if region.size > 0:
-            density = np.sum(region > 0) / region.size
-            interest_scores.append(density)
+            # Calculate edge density (interest level)
+            if region.size > 0:
+                density = np.sum(region > 0) / region.size
+                interest_scores.append(density)
 
-    # Calculate average interest at power points
-    avg_interest = np.mean(interest_scores) if interest_scores else 0
+        # Calculate average interest at power points
+        avg_interest = np.mean(interest_scores) if interest_scores else 0
 
-    # Score: 0-100 based on interest concentration
-    score = min(100, avg_interest * 500)  # Scale factor
+        # Score: 0-100 based on interest concentration
+        score = min(100, avg_interest * 500)  # Scale factor
+        metadata = {
+            "power_points": power_points,
+            "interest_scores": [round(s, 3) for s in interest_scores]
+        }
 
     # Generate feedback
     if score >= 80:
@@ -67,8 +106,5 @@ def analyze_rule_of_thirds(image: np.ndarray) -> Dict:
         "score": round(score, 1),
         "message": message,
         "suggestion": suggestion,
-        "metadata": {
-            "power_points": power_points,
-            "interest_scores": [round(s, 3) for s in interest_scores]
-        }
+        "metadata": metadata
     }
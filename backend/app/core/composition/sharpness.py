@@ -1,26 +1,82 @@
 import cv2
 import numpy as np
-from typing import Dict
+from typing import Dict, Optional, Tuple
+from .registry import laplacian_stats as compute_laplacian_stats, register_rule
 
 
-def analyze_sharpness(image: np.ndarray) -> Dict:
+def _format_shutter(seconds: float) -> str:
+    if seconds < 1:
+        return f"1/{round(1 / seconds)}s"
+    return f"{seconds:g}s"
+
+
+def shutter_hint(exif: Dict) -> Optional[str]:
+    """
+    Compare the shutter speed with the 1/focal-length handheld guideline
+
+    Returns a feedback sentence when the shot was slower than the guideline,
+    otherwise None.
+    """
+    exposure_time = exif.get("exposure_time")
+    focal_length = exif.get("focal_length_35mm") or exif.get("focal_length")
+    if not exposure_time or not focal_length:
+        return None
+
+    safe_time = 1 / focal_length
+    if exposure_time <= safe_time:
+        return None
+    return (
+        f"Shot at {_format_shutter(exposure_time)} with a {focal_length:g}mm lens, "
+        f"slower than the {_format_shutter(safe_time)} handheld guideline - "
+        f"camera shake is likely"
+    )
+
+
+@register_rule(
+    "sharpness",
+    "Sharpness",
+    requires={"laplacian_stats": "laplacian_stats", "exif": "exif", "frame_shape": "frame_shape"},
+    region="subject"
+)
+def analyze_sharpness(
+    image: np.ndarray,
+    laplacian: Optional[np.ndarray] = None,
+    exif: Optional[Dict] = None,
+    laplacian_stats: Optional[Tuple[float, Tuple[int, int]]] = None,
+    frame_shape: Optional[Tuple[int, int]] = None
+) -> Dict:
     """
     Analyze image sharpness using Laplacian variance
 
     Higher variance indicates sharper image (more edges/details)
-    """
-    # Convert to grayscale
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
-    # Calculate Laplacian variance
-    laplacian = cv2.Laplacian(gray, cv2.CV_64F)
-    variance = laplacian.var()
+    Args:
+        image: BGR image
+        laplacian: CV_64F Laplacian of the grayscale image, for standalone
+            callers that already have one; the analyzer passes
+            `laplacian_stats` instead and never builds the full Laplacian
+        exif: Parsed EXIF; shutter speed and focal length refine the feedback
+        laplacian_stats: Precomputed (Laplacian variance, (height, width)),
+            which avoids holding the float64 Laplacian at all
+        frame_shape: (height, width) of the whole photo when `image` is a
+            subject crop; the variance is normalized to the photo's size so
+            the same detail scores the same whatever the crop
+    """
+    if laplacian is not None:
+        variance = laplacian.var()
+        height, width = laplacian.shape
+    else:
+        if laplacian_stats is None:
+            # Calculate Laplacian variance of the grayscale image, in strips
+            laplacian_stats = compute_laplacian_stats(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY))
+        variance, (height, width) = laplacian_stats
 
     # Empirical thresholds (may need tuning based on image size)
     # Typical ranges: <100 (blurry), 100-500 (acceptable), >500 (sharp)
 
     # Normalize based on image size
-    height, width = gray.shape
+    if frame_shape is not None:
+        height, width = frame_shape[:2]
     pixels = height * width
     normalized_variance = variance * (1000000 / pixels)  # Normalize to 1MP
 
@@ -52,13 +108,22 @@ def analyze_sharpness(image: np.ndarray) -> Dict:
         suggestion = "Improve focus or reduce camera shake (use tripod/faster shutter)"
         quality = "poor"
 
+    metadata = {
+        "laplacian_variance": round(variance, 2),
+        "normalized_variance": round(normalized_variance, 2),
+        "quality": quality
+    }
+
+    # Explain likely motion blur from the capture settings
+    hint = shutter_hint(exif) if exif else None
+    if hint:
+        metadata["shutter_hint"] = hint
+        if quality in ("poor", "moderate"):
+            suggestion = f"{hint}. Use a faster shutter speed, stabilization or a tripod"
+
     return {
         "score": round(score, 1),
         "message": message,
         "suggestion": suggestion,
-        "metadata": {
-            "laplacian_variance": round(variance, 2),
-            "normalized_variance": round(normalized_variance, 2),
-            "quality": quality
-        }
+        "metadata": metadata
     }
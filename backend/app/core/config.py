@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Tuple
 
 
 class Settings(BaseSettings):
@@ -16,9 +16,12 @@ class Settings(BaseSettings):
     # Google Gemini API
     google_api_key: str = ""
     gemini_model: str = "gemini-2.0-flash-exp"
+    gemini_backend: str = "gemini"  # "gemini" or "fake" (canned responses, no API calls)
+    fake_gemini_latency: float = 0.0  # seconds, fake backend only
 
     # File Upload
     max_upload_size: int = 10 * 1024 * 1024  # 10MB
+    max_image_pixels: int = 100_000_000  # larger images are rejected before decoding
     allowed_extensions: set = {".jpg", ".jpeg", ".png", ".webp"}
     upload_dir: str = "uploads"
     output_dir: str = "outputs"
@@ -26,6 +29,64 @@ class Settings(BaseSettings):
     # Analysis Settings
     analysis_timeout: int = 5  # seconds
     generation_timeout: int = 30  # seconds
+    analysis_threads: int = 0  # threads running rules in parallel; 0 = min(4, cpu count)
+    min_rule_weight: float = 0.0  # skip rules weighted below this for the genre
+    preload_modules: bool = True  # import OpenCV/Gemini SDK in the background after startup
+
+    # Subject (ROI) Analysis
+    roi_frame_size: int = 1024  # longer side of the downscaled frame used outside the subject
+    roi_detect_size: int = 512  # longer side of the image subject detection runs on
+    roi_min_size: int = 16  # pixels; smaller subject boxes are rejected
+
+    # Sharpness
+    laplacian_strip_rows: int = 256  # rows of float64 Laplacian held at once; 0 = whole image
+
+    # CPU Tuning (per worker process)
+    opencv_threads: int = -1  # cv2.setNumThreads; -1 = OpenCV default, 0 = single-threaded
+    blas_threads: int = 0  # OMP/OpenBLAS/MKL threads for NumPy; 0 = library default
+    cpu_affinity: str = ""  # pin the process to CPUs, e.g. "0-3" or "0,2"; empty = no pinning
+    opencv_use_umat: bool = False  # route intermediates through cv2.UMat (transparent API)
+    opencv_opencl: bool = False  # keep UMat on the CPU unless explicitly enabled
+
+    # Readiness
+    warmup_enabled: bool = True
+    warmup_sizes: List[Tuple[int, int]] = [(1024, 768), (2048, 1536), (4032, 3024)]
+    warmup_rounds: int = 2  # measured rounds per size, after one unmeasured round
+    ready_degraded_factor: float = 3.0  # live/baseline per-rule latency ratio that marks degraded
+    ready_max_latency_ms: float = 0  # slowest warm-up step allowed on the largest size; 0 = off
+    ready_sample_max_load_mp: float = 12.0  # skip live samples while more MP of other analyses run
+    ready_probe_interval: float = 30.0  # seconds between re-benchmarks while degraded; 0 = off
+    ready_degraded_unavailable: bool = False  # /ready returns 503 (not 200) while degraded
+
+    # Analysis History
+    history_enabled: bool = True
+    history_db_path: str = "history.db"
+    history_batch_size: int = 100  # rows per write transaction
+    history_flush_interval: float = 1.0  # seconds
+    history_queue_size: int = 10000  # pending rows; further writes are dropped with a warning
+    history_page_size: int = 50
+    history_max_page_size: int = 500
+
+    # Generation Jobs
+    generation_workers: int = 4
+    generation_queue_depth: int = 100  # pending jobs before submissions get 429
+    job_retention: int = 1000  # finished jobs kept for polling
+    webhook_allowed_hosts: List[str] = ["localhost", "127.0.0.1"]
+    webhook_timeout: float = 5.0  # seconds
+
+    # Admission Control
+    admission_enabled: bool = True
+    admission_analyze_capacity_mp: float = 48.0  # megapixels analyzed concurrently
+    admission_generate_capacity: float = 8.0  # concurrent synchronous generations
+    admission_max_inflight: int = 64  # requests per endpoint group, including queued
+    admission_max_waiting: int = 32  # requests queued for capacity per endpoint group
+    admission_max_queue_wait: float = 10.0  # seconds before a queued request is shed
+    admission_client_header: str = ""  # e.g. "X-Forwarded-For" behind a proxy
+    admission_proxy_hops: int = 1  # trusted proxies appending to that header; counted from the right
+    rate_limit_analyze_per_minute: float = 60
+    rate_limit_analyze_burst: float = 10
+    rate_limit_generate_per_minute: float = 10
+    rate_limit_generate_burst: float = 3
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,60 @@
+import importlib
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+# Imported lazily on the request path; preloading them after startup keeps
+# the first analyze/generate request from paying their import cost.
+HEAVY_MODULES = [
+    "numpy",
+    "cv2",
+    "app.core.composition.analyzer",
+    "PIL.Image",
+    "google.generativeai",
+]
+
+
+class Preloader:
+    """Imports heavy modules on a background thread once the server is up"""
+
+    def __init__(self, modules: List[str]):
+        self.modules = modules
+        self.loaded: Dict[str, float] = {}  # module -> import time in ms
+        self.failed: Dict[str, str] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._done = threading.Event()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="preload", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        for name in self.modules:
+            start = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                self.failed[name] = str(e)
+            else:
+                self.loaded[name] = round((time.perf_counter() - start) * 1000, 1)
+        self._done.set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def status(self) -> Dict:
+        return {
+            "done": self.done,
+            "loaded_ms": dict(self.loaded),
+            "failed": dict(self.failed)
+        }
+
+
+preloader = Preloader(HEAVY_MODULES)
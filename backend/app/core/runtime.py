@@ -0,0 +1,73 @@
+import os
+from typing import Dict, List, Optional
+from .config import settings
+
+
+BLAS_ENV_VARS = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMEXPR_NUM_THREADS"]
+
+
+def parse_cpu_list(spec: str) -> List[int]:
+    """Parse a CPU list such as "0-3,6" into [0, 1, 2, 3, 6]"""
+    cpus = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return sorted(set(cpus))
+
+
+def configure_process():
+    """
+    Apply BLAS thread limits and CPU affinity to the current process
+
+    BLAS libraries read their thread count once, when NumPy is first
+    imported, so this must run before anything imports NumPy. OpenCV
+    likewise reads its decoder pixel limit when it is loaded; it is set
+    to `max_image_pixels` so no decode path allocates past it.
+    """
+    os.environ.setdefault("OPENCV_IO_MAX_IMAGE_PIXELS", str(settings.max_image_pixels))
+    if settings.blas_threads > 0:
+        for var in BLAS_ENV_VARS:
+            os.environ[var] = str(settings.blas_threads)
+
+    if settings.cpu_affinity and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, parse_cpu_list(settings.cpu_affinity))
+
+
+def configure_opencv(threads: Optional[int] = None):
+    """
+    Apply OpenCV threading and OpenCL settings
+
+    Args:
+        threads: Override for `opencv_threads` (e.g. 1 in process pools)
+    """
+    import cv2
+
+    threads = settings.opencv_threads if threads is None else threads
+    if threads >= 0:
+        cv2.setNumThreads(threads)
+    cv2.ocl.setUseOpenCL(settings.opencv_opencl)
+
+
+def runtime_info() -> Dict:
+    """Effective threading configuration, for metrics"""
+    import sys
+
+    info = {
+        "cpu_count": os.cpu_count(),
+        "blas_threads": {var: os.environ.get(var) for var in BLAS_ENV_VARS},
+        "umat": settings.opencv_use_umat
+    }
+    if hasattr(os, "sched_getaffinity"):
+        info["cpu_affinity"] = sorted(os.sched_getaffinity(0))
+    # Only report OpenCV state once something else has imported it
+    if "cv2" in sys.modules:
+        cv2 = sys.modules["cv2"]
+        info["opencv_threads"] = cv2.getNumThreads()
+        info["opencl"] = cv2.ocl.useOpenCL()
+    return info
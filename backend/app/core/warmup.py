@@ -0,0 +1,216 @@
+import logging
+import statistics
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, List, Optional
+from .config import settings
+from .preload import preloader
+
+logger = logging.getLogger(__name__)
+
+
+def synthetic_image(width: int, height: int, seed: int = 0):
+    """
+    Deterministic photo-like BGR test image
+
+    A sky/ground gradient split by a slightly tilted horizon, a subject
+    disc near a thirds power point and mild sensor-like noise, so every
+    rule exercises its real code path.
+    """
+    import cv2
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    rows = np.linspace(0, 1, height, dtype=np.float32)[:, None, None]
+    sky = np.array([230, 190, 150], dtype=np.float32)
+    ground = np.array([60, 110, 80], dtype=np.float32)
+    image = (sky * (1 - rows) + ground * rows).repeat(width, axis=1).astype(np.uint8)
+
+    horizon_y = int(height * 0.55)
+    cv2.line(image, (0, horizon_y), (width, horizon_y + height // 60), (40, 40, 40), max(2, height // 300))
+    cv2.circle(image, (width // 3, height // 3), min(width, height) // 10, (30, 60, 200), -1)
+
+    noise = rng.normal(0, 6, image.shape).astype(np.int16)
+    return np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+class Readiness:
+    """
+    Startup warm-up and latency-based readiness
+
+    The warm-up runs the full analyzer on synthetic images of typical sizes
+    so OpenCV initialization and the rule thread pool are paid for before
+    traffic arrives, and records per-rule baselines in ms per megapixel.
+    Live requests are compared against those baselines; a rule whose
+    median latency exceeds `ready_degraded_factor` x baseline marks the
+    node degraded, as does a warm-up slower than `ready_max_latency_ms`
+    until live traffic shows normal latencies. Only requests that ran on
+    a lightly loaded node are sampled, since the baseline was measured
+    idle. While degraded, a probe re-runs the benchmark every
+    `ready_probe_interval` seconds and clears the state when it passes,
+    so a node that gets no traffic can still recover.
+    """
+
+    LIVE_WINDOW = 50
+    MIN_LIVE_SAMPLES = 5
+
+    def __init__(self):
+        self.state = "starting"
+        self.error: Optional[str] = None
+        self.slow_warmup: Optional[str] = None
+        self.warmup_ms: Dict[str, Dict[str, float]] = {}
+        self.baseline_ms_per_mp: Dict[str, float] = {}
+        self._live: Dict[str, deque] = self._new_window()
+        self._thread: Optional[threading.Thread] = None
+        self._probe: Optional[threading.Thread] = None
+
+    def _new_window(self) -> Dict[str, deque]:
+        return defaultdict(lambda: deque(maxlen=self.LIVE_WINDOW))
+
+    def start(self):
+        """Run the warm-up on a background thread"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            preloader.wait()
+            self.state = "warming"
+            self.run_warmup()
+            self._update_state()
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+
+    @staticmethod
+    def _benchmark(analyzer, width: int, height: int, rounds: int) -> Dict[str, float]:
+        """Median per-rule ms over `rounds` analyses of a synthetic image"""
+        image = synthetic_image(width, height)
+        timings = [analyzer.analyze_image(image)["metadata"]["timings_ms"] for _ in range(rounds)]
+        return {name: statistics.median(t[name] for t in timings) for name in timings[0]}
+
+    def _slow_message(self, medians: Dict[str, float]) -> Optional[str]:
+        slowest = max(medians.values())
+        if settings.ready_max_latency_ms and slowest > settings.ready_max_latency_ms:
+            return f"Warm-up latency {slowest:.0f}ms exceeds {settings.ready_max_latency_ms:.0f}ms"
+        return None
+
+    def run_warmup(self):
+        from .composition.analyzer import CompositionAnalyzer
+
+        analyzer = CompositionAnalyzer()
+        per_mp: Dict[str, List[float]] = defaultdict(list)
+
+        for width, height in settings.warmup_sizes:
+            megapixels = width * height / 1_000_000
+            # The first round pays one-off initialization; baseline on the rest
+            self._benchmark(analyzer, width, height, 1)
+            medians = self._benchmark(analyzer, width, height, max(1, settings.warmup_rounds))
+            self.warmup_ms[f"{width}x{height}"] = {k: round(v, 2) for k, v in medians.items()}
+            for name, ms in medians.items():
+                per_mp[name].append(ms / megapixels)
+
+        self.baseline_ms_per_mp = {name: statistics.median(values) for name, values in per_mp.items()}
+        largest = self.warmup_ms[f"{settings.warmup_sizes[-1][0]}x{settings.warmup_sizes[-1][1]}"]
+        self.slow_warmup = self._slow_message(largest)
+
+    def probe(self) -> bool:
+        """
+        Re-run the benchmark on the largest warm-up size
+
+        A probe within both limits discards the live samples and any slow
+        warm-up verdict, and the state is re-evaluated from scratch.
+
+        Returns:
+            Whether the probe passed
+        """
+        from .composition.analyzer import CompositionAnalyzer
+
+        width, height = settings.warmup_sizes[-1]
+        megapixels = width * height / 1_000_000
+        medians = self._benchmark(CompositionAnalyzer(), width, height, max(1, settings.warmup_rounds))
+        slow_rules = [
+            name for name, ms in medians.items()
+            if self.baseline_ms_per_mp.get(name, 0) > 0
+            and ms / megapixels > self.baseline_ms_per_mp[name] * settings.ready_degraded_factor
+        ]
+        if slow_rules or self._slow_message(medians):
+            return False
+
+        self._live = self._new_window()
+        self.slow_warmup = None
+        self._update_state()
+        return True
+
+    def _probe_loop(self):
+        while self.state == "degraded":
+            time.sleep(settings.ready_probe_interval)
+            if self.state != "degraded":
+                break
+            try:
+                self.probe()
+            except Exception:
+                logger.exception("Readiness probe failed")
+
+    def observe(self, timings_ms: Dict[str, float], pixels: int, load_mp: float = 0.0):
+        """
+        Record the per-rule latencies of a live analysis
+
+        Args:
+            timings_ms: Per-rule latencies
+            pixels: Pixels analyzed
+            load_mp: Megapixels of other analyses in flight; above
+                `ready_sample_max_load_mp` the sample is skipped, since
+                concurrent work shares the rule pool and reads slow even
+                on a healthy node
+        """
+        if load_mp > settings.ready_sample_max_load_mp:
+            return
+        megapixels = max(pixels / 1_000_000, 0.01)
+        for name, ms in timings_ms.items():
+            self._live[name].append(ms / megapixels)
+
+        if self.state in ("ready", "degraded"):
+            self._update_state()
+
+    def _update_state(self):
+        has_live = any(len(samples) >= self.MIN_LIVE_SAMPLES for samples in self._live.values())
+        slow = self.slow_warmup is not None and not has_live
+        self.state = "degraded" if slow or self.degraded_rules() else "ready"
+
+        if self.state == "degraded" and settings.ready_probe_interval > 0 \
+                and (self._probe is None or not self._probe.is_alive()):
+            self._probe = threading.Thread(target=self._probe_loop, name="readiness-probe", daemon=True)
+            self._probe.start()
+
+    def degraded_rules(self) -> Dict[str, float]:
+        """Rules whose live median exceeds the allowed multiple of their baseline"""
+        degraded = {}
+        for name, baseline in self.baseline_ms_per_mp.items():
+            samples = self._live.get(name)
+            if not samples or len(samples) < self.MIN_LIVE_SAMPLES or baseline <= 0:
+                continue
+            ratio = statistics.median(samples) / baseline
+            if ratio > settings.ready_degraded_factor:
+                degraded[name] = round(ratio, 2)
+        return degraded
+
+    def status(self) -> Dict:
+        return {
+            "status": self.state,
+            "error": self.error,
+            "slow_warmup": self.slow_warmup,
+            "warmup_ms": self.warmup_ms,
+            "baseline_ms_per_mp": {k: round(v, 3) for k, v in self.baseline_ms_per_mp.items()},
+            "live_ms_per_mp": {
+                name: round(statistics.median(samples), 3)
+                for name, samples in self._live.items() if samples
+            },
+            "degraded_rules": self.degraded_rules()
+        }
+
+
+readiness = Readiness()
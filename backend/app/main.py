@@ -1,9 +1,19 @@
+from .core.runtime import configure_process, runtime_info
+
+# Thread limits and affinity must be set before NumPy/OpenCV are imported
+configure_process()
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 from .core.config import settings
-from .api import analyze, generate
+from .core.admission import AdmissionMiddleware, admission
+from .core.preload import preloader
+from .core.warmup import readiness
+from .api import analyze, generate, history
+from .services.history_store import history_store
 
 # Create FastAPI app
 app = FastAPI(
@@ -12,6 +22,11 @@ app = FastAPI(
     description="AI-powered photo composition analysis and enhancement service"
 )
 
+# Shed load per client and per endpoint group before reading uploads
+# (added before CORS so rejections still carry CORS headers)
+if settings.admission_enabled:
+    app.add_middleware(AdmissionMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -32,6 +47,29 @@ app.mount("/outputs", StaticFiles(directory=settings.output_dir), name="outputs"
 # Include routers
 app.include_router(analyze.router, prefix=settings.api_prefix, tags=["Analysis"])
 app.include_router(generate.router, prefix=settings.api_prefix, tags=["Generation"])
+app.include_router(history.router, prefix=settings.api_prefix, tags=["History"])
+
+
+@app.on_event("startup")
+async def startup():
+    """Start background services"""
+    # Heavy modules load lazily; warm them without delaying the first /health
+    if settings.preload_modules or settings.warmup_enabled:
+        preloader.start()
+    # Warm-up waits for the preload, then benchmarks the analyzer
+    if settings.warmup_enabled:
+        readiness.start()
+    if settings.history_enabled:
+        history_store.start()
+    await generate.generation_jobs.start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Flush and stop background services"""
+    await generate.generation_jobs.stop()
+    if settings.history_enabled:
+        history_store.stop()
 
 
 @app.get("/")
@@ -45,12 +83,41 @@ async def root():
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    """Admission, job queue, preload and runtime metrics"""
+    return {
+        "admission": admission.metrics(),
+        "generation_jobs": generate.generation_jobs.metrics(),
+        "preload": preloader.status(),
+        "runtime": runtime_info()
+    }
+
+
 @app.get("/health")
 async def health():
     """Health check"""
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def ready():
+    """
+    Readiness check
+
+    503 until the startup warm-up has finished. While per-rule latencies
+    are degraded relative to the warm-up baseline the body says so with a
+    200, or a 503 with `ready_degraded_unavailable`.
+    """
+    if not settings.warmup_enabled:
+        return {"status": "ready"}
+    status = readiness.status()
+    serving = status["status"] == "ready" or (
+        status["status"] == "degraded" and not settings.ready_degraded_unavailable
+    )
+    return JSONResponse(status, status_code=200 if serving else 503)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
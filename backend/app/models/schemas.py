@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional, Union
 from enum import Enum
 
 
@@ -25,7 +25,47 @@ class CompositionAnalysis(BaseModel):
     rules: List[RuleScore]
     coach_guide: str
     expert_prompt: str
-    metadata: Dict[str, any] = {}
+    metadata: Dict[str, Any] = {}
+
+
+class ResponseView(str, Enum):
+    """How much of an analysis to return"""
+    COMPACT = "compact"  # total and per-rule scores only
+    FULL = "full"  # scores, feedback text and basic metadata
+    VERBOSE = "verbose"  # full plus weights and raw per-rule results
+
+
+class CompactRuleScore(BaseModel):
+    """Rule score without feedback text"""
+    name: str
+    score: float
+
+
+class CompactCompositionAnalysis(BaseModel):
+    """Scores-only analysis result for bandwidth-constrained clients"""
+    total_score: float
+    genre: GenreType
+    rules: List[CompactRuleScore]
+
+
+class PreviewAnalysis(CompactCompositionAnalysis):
+    """Preliminary scores from the EXIF thumbnail or a reduced decode"""
+    source: str = Field(..., description="exif_thumbnail or reduced_decode")
+    elapsed_ms: float
+    exif: Dict[str, Any] = {}
+
+
+class GenreRecommendation(BaseModel):
+    """Genre suggested from the raw rule results"""
+    genre: GenreType
+    confidence: float = Field(..., ge=0, le=1, description="Share of the evidence for this genre")
+    reasons: List[str]
+
+
+class MultiGenreAnalysis(BaseModel):
+    """One image scored for several genres"""
+    results: Dict[GenreType, Union[CompositionAnalysis, CompactCompositionAnalysis]]
+    recommendation: GenreRecommendation
 
 
 class AnalyzeRequest(BaseModel):
@@ -45,4 +85,44 @@ class GenerateResponse(BaseModel):
     success: bool
     image_url: Optional[str] = None
     error: Optional[str] = None
-    metadata: Dict[str, any] = {}
+    metadata: Dict[str, Any] = {}
+
+
+class JobSubmitted(BaseModel):
+    """Acknowledgement for a queued generation job"""
+    job_id: str
+    status: str
+    status_url: str
+
+
+class JobStatus(BaseModel):
+    """Current state of a generation job"""
+    job_id: str
+    status: str  # queued, running, succeeded, failed
+    priority: int
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[GenerateResponse] = None
+    error: Optional[str] = None
+
+
+class HistoryEntry(BaseModel):
+    """Summary of a stored analysis"""
+    id: int
+    file_hash: str
+    genre: GenreType
+    user_id: Optional[str] = None
+    total_score: float
+    created_at: float
+
+
+class HistoryDetail(HistoryEntry):
+    """Stored analysis including the full result"""
+    result: CompositionAnalysis
+
+
+class HistoryPage(BaseModel):
+    """Page of history entries, newest first"""
+    items: List[HistoryEntry]
+    next_cursor: Optional[int] = None
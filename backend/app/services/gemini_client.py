@@ -1,5 +1,3 @@
-import google.generativeai as genai
-from PIL import Image
 import base64
 import io
 from typing import Optional, Dict
@@ -15,6 +13,9 @@ class GeminiClient:
         if not settings.google_api_key:
             raise ValueError("GOOGLE_API_KEY not configured")
 
+        # Imported here so processes that never generate skip the SDK's import cost
+        import google.generativeai as genai
+
         genai.configure(api_key=settings.google_api_key)
         self.model = genai.GenerativeModel(settings.gemini_model)
 
@@ -37,6 +38,8 @@ class GeminiClient:
         Returns:
             Dict with success status and result
         """
+        from PIL import Image
+
         try:
             # Load original image
             original_image = Image.open(image_path)
@@ -106,6 +109,39 @@ Be specific and technical in your recommendations."""
         return prompt
 
 
+class FakeGeminiClient:
+    """Drop-in stand-in for GeminiClient that never calls the API
+
+    Used for load tests and job queue tests; returns canned suggestions
+    after `fake_gemini_latency` seconds.
+    """
+
+    def __init__(self, latency: Optional[float] = None):
+        self.latency = settings.fake_gemini_latency if latency is None else latency
+
+    async def generate_image(
+        self,
+        image_path: str,
+        prompt: str,
+        style: str = "natural",
+        strength: float = 0.7
+    ) -> Dict:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return {
+            "success": True,
+            "suggestions": f"[fake] {style} edit at strength {strength}: {prompt}",
+            "note": "Fake Gemini backend - no API call was made"
+        }
+
+
+def get_gemini_client():
+    """Return the client for the configured backend"""
+    if settings.gemini_backend == "fake":
+        return FakeGeminiClient()
+    return GeminiClient()
+
+
 async def generate_nano_banana(
     image_path: str,
     prompt: str,
@@ -124,5 +160,5 @@ async def generate_nano_banana(
     Returns:
         Generation result
     """
-    client = GeminiClient()
+    client = get_gemini_client()
     return await client.generate_image(image_path, prompt, style, strength)
@@ -0,0 +1,252 @@
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from ..core.composition import ANALYZER_VERSION
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_hash TEXT NOT NULL,
+    genre TEXT NOT NULL,
+    user_id TEXT,
+    total_score REAL NOT NULL,
+    created_at REAL NOT NULL,
+    result TEXT NOT NULL,
+    analyzer_version INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_hash_genre ON analyses (file_hash, genre, id);
+CREATE INDEX IF NOT EXISTS idx_analyses_user ON analyses (user_id, id);
+CREATE INDEX IF NOT EXISTS idx_analyses_user_score ON analyses (user_id, total_score);
+CREATE INDEX IF NOT EXISTS idx_analyses_score ON analyses (total_score, id);
+"""
+
+SUMMARY_COLUMNS = "id, file_hash, genre, user_id, total_score, created_at"
+
+
+class HistoryStore:
+    """Embedded SQLite store for past composition analyses
+
+    Writes are queued and committed in batches by a background thread so the
+    request path never waits on disk; the queue is bounded and a failed batch
+    is logged and dropped rather than stopping the writer. Reads use one
+    connection per thread; WAL mode lets them run while the writer is
+    committing.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None
+    ):
+        self.db_path = db_path or settings.history_db_path
+        self.batch_size = batch_size or settings.history_batch_size
+        self.flush_interval = flush_interval or settings.history_flush_interval
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=settings.history_queue_size)
+        self._local = threading.local()
+        self._writer: Optional[threading.Thread] = None
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection, creating the schema on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    columns = {row["name"] for row in conn.execute("PRAGMA table_info(analyses)")}
+                    if "analyzer_version" not in columns:
+                        # Databases from before versioning; their rows are never re-served
+                        conn.execute("ALTER TABLE analyses ADD COLUMN analyzer_version INTEGER")
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def start(self):
+        """Start the background writer thread"""
+        if self._writer is not None and self._writer.is_alive():
+            return
+        self._connect()
+        self._writer = threading.Thread(
+            target=self._write_loop, name="history-writer", daemon=True
+        )
+        self._writer.start()
+
+    def stop(self):
+        """Flush pending writes and stop the writer thread"""
+        if self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+
+    def record(
+        self,
+        file_hash: str,
+        genre: str,
+        result: Dict,
+        user_id: Optional[str] = None
+    ):
+        """
+        Queue an analysis result for persistence
+
+        Args:
+            file_hash: SHA-256 of the uploaded file
+            genre: Photo genre used for scoring
+            result: Serialized CompositionAnalysis
+            user_id: Optional client-supplied user identifier
+        """
+        row = (
+            file_hash,
+            genre,
+            user_id,
+            float(result["total_score"]),
+            time.time(),
+            json.dumps(result, ensure_ascii=False),
+            ANALYZER_VERSION
+        )
+        if self._writer is None:
+            self._write_batch([row])
+            return
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            logger.warning("History queue full (%d rows); dropping result for %s", self._queue.maxsize, file_hash)
+
+    def _write_loop(self):
+        """Drain the queue, committing up to batch_size rows per transaction"""
+        stopping = False
+        while not stopping:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if item is None:
+                stopping = True
+
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception:
+                    # Keep the writer alive; losing a batch beats an unbounded backlog
+                    logger.exception("Failed to write %d history rows; dropping them", len(batch))
+
+    def _write_batch(self, rows: List[tuple]):
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO analyses "
+                "(file_hash, genre, user_id, total_score, created_at, result, analyzer_version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def get_by_hash(
+        self,
+        file_hash: str,
+        genre: str,
+        user_id: Optional[str] = None
+    ) -> Optional[Tuple[Dict, bool]]:
+        """
+        Return the most recent result for a file and genre scored by the current analyzer
+
+        The user's own entry is preferred over other users'.
+
+        Returns:
+            (result, whether it was recorded for `user_id`), or None
+        """
+        row = self._connect().execute(
+            "SELECT result, user_id IS ? AS own FROM analyses "
+            "WHERE file_hash = ? AND genre = ? AND analyzer_version = ? "
+            "ORDER BY own DESC, id DESC LIMIT 1",
+            (user_id, file_hash, genre, ANALYZER_VERSION)
+        ).fetchone()
+        return (json.loads(row["result"]), bool(row["own"])) if row else None
+
+    def get(self, entry_id: int) -> Optional[Dict]:
+        """Return a single history entry including its full result"""
+        row = self._connect().execute(
+            f"SELECT {SUMMARY_COLUMNS}, result FROM analyses WHERE id = ?",
+            (entry_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["result"] = json.loads(entry["result"])
+        return entry
+
+    def query(
+        self,
+        user_id: Optional[str] = None,
+        genre: Optional[str] = None,
+        min_score: Optional[float] = None,
+        max_score: Optional[float] = None,
+        cursor: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> Dict:
+        """
+        Page through history summaries, newest first
+
+        Uses keyset pagination on the row id, so every page costs the same
+        regardless of how deep into the history it is.
+
+        Returns:
+            Dict with "items" and "next_cursor" (None on the last page)
+        """
+        limit = min(limit or settings.history_page_size, settings.history_max_page_size)
+
+        clauses = []
+        params: List = []
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if genre is not None:
+            clauses.append("genre = ?")
+            params.append(genre)
+        if min_score is not None:
+            clauses.append("total_score >= ?")
+            params.append(min_score)
+        if max_score is not None:
+            clauses.append("total_score <= ?")
+            params.append(max_score)
+        if cursor is not None:
+            clauses.append("id < ?")
+            params.append(cursor)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            f"SELECT {SUMMARY_COLUMNS} FROM analyses {where} ORDER BY id DESC LIMIT ?",
+            (*params, limit + 1)
+        ).fetchall()
+
+        items = [dict(row) for row in rows[:limit]]
+        next_cursor = items[-1]["id"] if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+
+history_store = HistoryStore()
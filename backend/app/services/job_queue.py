@@ -0,0 +1,209 @@
+import asyncio
+import itertools
+import json
+import time
+import urllib.request
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+from ..core.config import settings
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at its depth limit"""
+
+
+class Job:
+    """A unit of background work and its current state"""
+
+    def __init__(
+        self,
+        payload: Dict,
+        priority: int = 0,
+        callback_url: Optional[str] = None
+    ):
+        self.job_id = str(uuid.uuid4())
+        self.payload = payload
+        self.priority = priority
+        self.callback_url = callback_url
+        self.status = "queued"
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "priority": self.priority,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error
+        }
+
+
+class JobQueue:
+    """
+    Bounded priority queue drained by a fixed pool of asyncio workers
+
+    Higher priority jobs run first; equal priorities run in submission order.
+    A job still running after `timeout` seconds is cancelled and marked
+    failed, so a hung backend call cannot hold a worker forever. Finished
+    jobs are retained for polling up to `max_retained` entries and, when a
+    callback URL was given, POSTed to it as JSON.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Dict], Awaitable[Dict]],
+        workers: Optional[int] = None,
+        max_depth: Optional[int] = None,
+        max_retained: Optional[int] = None,
+        timeout: Optional[float] = None
+    ):
+        self.handler = handler
+        self.workers = workers or settings.generation_workers
+        self.max_depth = max_depth or settings.generation_queue_depth
+        self.max_retained = max_retained or settings.job_retention
+        self.timeout = timeout or settings.generation_timeout
+
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._seq = itertools.count()
+        self._running = 0
+        self._counters = {"submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0, "timed_out": 0}
+        self._wait_total = 0.0
+        self._run_total = 0.0
+
+    async def start(self):
+        """Spawn the worker tasks on the running event loop"""
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue(maxsize=self.max_depth)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self):
+        """Cancel the workers; queued jobs are dropped"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(
+        self,
+        payload: Dict,
+        priority: int = 0,
+        callback_url: Optional[str] = None
+    ) -> Job:
+        """
+        Enqueue a job
+
+        Raises:
+            QueueFullError: If the queue is at its depth limit
+            ValueError: If the callback URL is not an allowed webhook target
+        """
+        if self._queue is None:
+            raise RuntimeError("Job queue is not running")
+        if callback_url:
+            _validate_callback_url(callback_url)
+
+        job = Job(payload, priority=priority, callback_url=callback_url)
+        try:
+            self._queue.put_nowait((-priority, next(self._seq), job))
+        except asyncio.QueueFull:
+            self._counters["rejected"] += 1
+            raise QueueFullError(f"Job queue is full ({self.max_depth} pending)")
+
+        self._counters["submitted"] += 1
+        self._jobs[job.job_id] = job
+        self._evict()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def metrics(self) -> Dict:
+        finished = self._counters["succeeded"] + self._counters["failed"]
+        return {
+            **self._counters,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_depth": self.max_depth,
+            "running": self._running,
+            "workers": self.workers,
+            "avg_wait_ms": round(self._wait_total / finished * 1000, 1) if finished else 0.0,
+            "avg_run_ms": round(self._run_total / finished * 1000, 1) if finished else 0.0
+        }
+
+    async def _worker(self):
+        while True:
+            _, _, job = await self._queue.get()
+            self._running += 1
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = await asyncio.wait_for(self.handler(job.payload), self.timeout)
+                job.status = "succeeded"
+                self._counters["succeeded"] += 1
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                job.error = f"Timed out after {self.timeout:g}s"
+                job.status = "failed"
+                self._counters["failed"] += 1
+                self._counters["timed_out"] += 1
+            except Exception as e:
+                job.error = str(e)
+                job.status = "failed"
+                self._counters["failed"] += 1
+            finally:
+                job.finished_at = time.time()
+                self._wait_total += job.started_at - job.created_at
+                self._run_total += job.finished_at - job.started_at
+                self._running -= 1
+                self._queue.task_done()
+
+            if job.callback_url:
+                try:
+                    await asyncio.to_thread(_post_callback, job.callback_url, job.to_dict())
+                except Exception:
+                    pass  # Clients can still poll for the result
+
+    def _evict(self):
+        """Drop the oldest finished jobs once more than max_retained are held"""
+        excess = len(self._jobs) - self.max_retained
+        if excess <= 0:
+            return
+        for job_id in [jid for jid, job in self._jobs.items() if job.done][:excess]:
+            del self._jobs[job_id]
+
+
+def _validate_callback_url(url: str):
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https"):
+        raise ValueError("Callback URL must use http or https")
+    if parsed.hostname not in settings.webhook_allowed_hosts:
+        raise ValueError(f"Callback host not allowed. Allowed: {settings.webhook_allowed_hosts}")
+
+
+def _post_callback(url: str, body: Dict):
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(body).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    with urllib.request.urlopen(request, timeout=settings.webhook_timeout):
+        pass
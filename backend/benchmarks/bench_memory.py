@@ -0,0 +1,112 @@
+"""
+Peak memory of concurrent full-resolution analyses, with whole and strip Laplacian
+
+Each configuration runs in a fresh process: N threads start together on
+a barrier and each analyzes the same JPEG from disk, as concurrent
+requests do after admission. Peak RSS (VmHWM, Linux) above the
+process's idle RSS, divided by N, is the memory one in-flight request costs.
+The server's admission limit (ADMISSION_ANALYZE_CAPACITY_MP) then bounds the
+total. Admission is bypassed here so the concurrency is exact.
+
+Usage (from backend/):
+    python -m benchmarks.bench_memory [--concurrency 16] [--size 6000x4000] [--rounds 2]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+CHILD = """
+import json, sys, threading, time
+from app.core.runtime import configure_process
+configure_process()
+from app.core.composition.analyzer import CompositionAnalyzer
+from benchmarks.synthetic import synthetic_image
+path, concurrency, rounds = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+
+def status_kb(field):
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(field + ":"))
+
+analyzer = CompositionAnalyzer()
+analyzer.analyze_image(synthetic_image(320, 240))
+base_kb = status_kb("VmRSS")
+
+barrier = threading.Barrier(concurrency)
+def worker():
+    for _ in range(rounds):
+        barrier.wait()
+        analyzer.analyze(path)
+
+start = time.perf_counter()
+threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+elapsed = time.perf_counter() - start
+peak_kb = status_kb("VmHWM")
+print(json.dumps({
+    "base_mb": base_kb / 1024,
+    "peak_mb": peak_kb / 1024,
+    "per_request_mb": (peak_kb - base_kb) / 1024 / concurrency,
+    "images_per_s": concurrency * rounds / elapsed
+}))
+"""
+
+CONFIGS = [
+    ("whole Laplacian", {"LAPLACIAN_STRIP_ROWS": "0"}),
+    ("strip Laplacian", {})
+]
+
+
+def write_image(path: str, width: int, height: int):
+    import cv2
+    from benchmarks.synthetic import synthetic_image
+
+    if not cv2.imwrite(path, synthetic_image(width, height), [cv2.IMWRITE_JPEG_QUALITY, 92]):
+        raise RuntimeError(f"Failed to write {path}")
+
+
+def run_config(overrides: dict, path: str, concurrency: int, rounds: int):
+    env = {**os.environ, "HISTORY_ENABLED": "false", "WARMUP_ENABLED": "false", **overrides}
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD, path, str(concurrency), str(rounds)],
+        env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        # A negative code is the signal, e.g. -9 from the OOM killer
+        return None, proc.returncode
+    return json.loads(proc.stdout.strip().splitlines()[-1]), 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=16, help="Simultaneous analyses")
+    parser.add_argument("--size", default="6000x4000", help="Image size (default 24MP)")
+    parser.add_argument("--rounds", type=int, default=2, help="Batches per thread")
+    args = parser.parse_args()
+
+    width, height = map(int, args.size.split("x"))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.jpg")
+        write_image(path, width, height)
+        size_mb = os.path.getsize(path) / 2**20
+        print(f"{args.concurrency} concurrent x {args.rounds} rounds, {args.size} JPEG ({size_mb:.1f}MB)")
+        print(f"{'configuration':<16} {'base MB':>8} {'peak MB':>8} {'MB/request':>11} {'img/s':>6}")
+
+        for name, overrides in CONFIGS:
+            result, code = run_config(overrides, path, args.concurrency, args.rounds)
+            if result is None:
+                print(f"{name:<16} failed (exit code {code})")
+                continue
+            print(
+                f"{name:<16} {result['base_mb']:>8.0f} {result['peak_mb']:>8.0f} "
+                f"{result['per_request_mb']:>11.1f} {result['images_per_s']:>6.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
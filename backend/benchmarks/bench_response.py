@@ -0,0 +1,69 @@
+"""
+Response size and serialization cost per analysis view
+
+Compares FastAPI's default response path (validate against response_model,
+jsonable_encoder, json.dumps) with the direct pydantic serializer used by
+`render_analysis`, for each view.
+
+Usage (from backend/):
+    python -m benchmarks.bench_response [--iterations 2000]
+"""
+import argparse
+import json
+import time
+import cv2
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from app.api.analyze import render_analysis
+from app.core.composition import CompositionAnalyzer
+from app.models.schemas import CompositionAnalysis, GenreType, ResponseView, RuleScore
+
+
+def synthetic_analysis() -> CompositionAnalysis:
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 255, (1200, 1600, 3), dtype=np.uint8)
+    cv2.line(image, (0, 600), (1600, 640), (20, 20, 20), 5)
+
+    path = "/tmp/bench_response.jpg"
+    cv2.imwrite(path, image)
+    result = CompositionAnalyzer(genre="landscape").analyze(path)
+    return CompositionAnalysis(
+        total_score=result["total_score"],
+        genre=GenreType.LANDSCAPE,
+        rules=[RuleScore(**rule) for rule in result["rules"]],
+        coach_guide=result["coach_guide"],
+        expert_prompt=result["expert_prompt"],
+        metadata={**result["metadata"], "file_id": "bench", "filename": "bench.jpg"}
+    )
+
+
+def timeit(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    analysis = synthetic_analysis()
+
+    def default_path():
+        validated = CompositionAnalysis.model_validate(analysis.model_dump())
+        return json.dumps(jsonable_encoder(validated)).encode("utf-8")
+
+    rows = [("default (verbose)", len(default_path()), timeit(default_path, args.iterations))]
+    for view in ResponseView:
+        render = lambda: render_analysis(analysis, view).body
+        rows.append((f"render {view.value}", len(render()), timeit(render, args.iterations)))
+
+    print(f"{'path':<20} {'bytes':>8} {'us/op':>10}")
+    for name, size, micros in rows:
+        print(f"{name:<20} {size:>8} {micros:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Cold start timing for the API process
+
+Reports, each from a fresh interpreter:
+  - import time of app.main and which heavy modules it pulled in
+  - time from spawning uvicorn to the first successful /health
+  - time until background preloading of heavy modules has finished
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup [--runs 3] [--port 8765]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+HEAVY = ["cv2", "numpy", "PIL.Image", "google.generativeai"]
+
+IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({{"import_ms": elapsed, "heavy": [m for m in {HEAVY!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import() -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def poll(url: str, proc: subprocess.Popen, deadline: float, predicate=lambda body: True) -> float:
+    while time.perf_counter() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited with code {proc.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=0.5) as response:
+                if response.status == 200 and predicate(json.loads(response.read())):
+                    return time.perf_counter()
+        except Exception:
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(url)
+
+
+def measure_server(port: int) -> dict:
+    env = {**os.environ, "HISTORY_ENABLED": "false"}
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        healthy = poll(f"{base}/health", proc, start + 60)
+        preloaded = poll(f"{base}/metrics", proc, start + 120, lambda body: body["preload"]["done"])
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {
+        "health_ms": (healthy - start) * 1000,
+        "preloaded_ms": (preloaded - start) * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    servers = [measure_server(args.port) for _ in range(args.runs)]
+
+    print(f"import app.main:        {statistics.median(r['import_ms'] for r in imports):8.1f} ms")
+    print(f"heavy modules imported: {imports[0]['heavy'] or 'none'}")
+    print(f"spawn -> /health 200:   {statistics.median(r['health_ms'] for r in servers):8.1f} ms")
+    print(f"spawn -> preload done:  {statistics.median(r['preloaded_ms'] for r in servers):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
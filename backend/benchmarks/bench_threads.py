@@ -0,0 +1,96 @@
+"""
+Throughput matrix over worker processes, OpenCV threads and rule threads
+
+Each configuration launches N worker processes (standing in for uvicorn
+workers) that analyze synthetic images concurrently, with the settings
+applied through the same environment variables the server reads. The
+fastest configuration for this machine's core count is printed last.
+
+Usage (from backend/):
+    python -m benchmarks.bench_threads [--images 6] [--size 4032x3024] [--umat]
+"""
+import argparse
+import itertools
+import os
+import subprocess
+import sys
+import time
+
+CHILD = """
+import sys, time
+from app.core.runtime import configure_process
+configure_process()
+from app.core.warmup import synthetic_image
+from app.core.composition.analyzer import CompositionAnalyzer
+width, height, count = map(int, sys.argv[1:4])
+image = synthetic_image(width, height)
+analyzer = CompositionAnalyzer()
+analyzer.analyze_image(image)
+for _ in range(count):
+    analyzer.analyze_image(image)
+"""
+
+
+def candidates(cores: int):
+    """Powers of two up to the core count, plus the core count itself"""
+    values = {1, cores}
+    n = 2
+    while n < cores:
+        values.add(n)
+        n *= 2
+    return sorted(values)
+
+
+def run_config(processes: int, opencv_threads: int, rule_threads: int, umat: bool,
+               width: int, height: int, images: int) -> float:
+    env = {
+        **os.environ,
+        "OPENCV_THREADS": str(opencv_threads),
+        "ANALYSIS_THREADS": str(rule_threads),
+        "BLAS_THREADS": "1",
+        "OPENCV_USE_UMAT": "true" if umat else "false"
+    }
+    start = time.perf_counter()
+    procs = [
+        subprocess.Popen([sys.executable, "-c", CHILD, str(width), str(height), str(images)], env=env)
+        for _ in range(processes)
+    ]
+    for proc in procs:
+        if proc.wait() != 0:
+            raise RuntimeError("Benchmark worker failed")
+    elapsed = time.perf_counter() - start
+    return processes * images / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", type=int, default=6, help="Images per worker process")
+    parser.add_argument("--size", default="4032x3024")
+    parser.add_argument("--umat", action="store_true", help="Also measure the UMat path")
+    args = parser.parse_args()
+
+    width, height = map(int, args.size.split("x"))
+    cores = os.cpu_count() or 1
+    values = candidates(cores)
+    umat_options = [False, True] if args.umat else [False]
+
+    print(f"{cores} cores, {args.size}, {args.images} images per process")
+    print(f"{'procs':>5} {'cv2':>4} {'rules':>5} {'umat':>5} {'img/s':>8}")
+    results = []
+    for processes, opencv_threads, rule_threads, umat in itertools.product(values, values, [1, 4], umat_options):
+        # Skip configurations that oversubscribe by more than 2x
+        if processes * max(opencv_threads, rule_threads) > cores * 2:
+            continue
+        rate = run_config(processes, opencv_threads, rule_threads, umat, width, height, args.images)
+        results.append((rate, processes, opencv_threads, rule_threads, umat))
+        print(f"{processes:>5} {opencv_threads:>4} {rule_threads:>5} {str(umat):>5} {rate:>8.2f}")
+
+    rate, processes, opencv_threads, rule_threads, umat = max(results)
+    print(
+        f"\nBest: {processes} workers with OPENCV_THREADS={opencv_threads} "
+        f"ANALYSIS_THREADS={rule_threads} OPENCV_USE_UMAT={str(umat).lower()} ({rate:.2f} img/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Golden-score regression check for the composition rules
+
+Analyzes a fixed, deterministically generated corpus and compares every
+rule's score and metadata, and each genre's total, against the recorded
+golden output in benchmarks/golden.json. Per-rule median timings are
+recorded next to the scores. Timing is advisory: it is printed for every
+case but only fails the check when --time-factor is given, and then only
+on each case's total time (per-rule timings of a few ms are too noisy to
+gate on). Re-record after an intentional scoring change. The corpus is
+built from benchmarks/synthetic.py, a frozen copy of the warm-up image
+generator, so warm-up changes cannot alter the inputs. The accuracy check
+also runs as part of the pytest suite (tests/test_golden.py).
+
+Usage (from backend/):
+    python -m benchmarks.golden check [--time-factor 3.0] [--case NAME]
+    python -m benchmarks.golden record [--rounds 5]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from app.core.composition.analyzer import CompositionAnalyzer
+from app.core.composition.registry import RULES
+from app.core.composition.roi import SubjectSpec
+from benchmarks.synthetic import synthetic_image
+
+GOLDEN_PATH = Path(__file__).with_name("golden.json")
+GENRES = ["portrait", "landscape", "product"]
+
+# Allowed absolute score drift per rule (points out of 100)
+RULE_TOLERANCES = {
+    "rule_of_thirds": 1.0,
+    "horizon": 1.0,
+    "exposure": 0.5,
+    "sharpness": 1.0
+}
+DEFAULT_TOLERANCE = 1.0
+TOTAL_TOLERANCE = 0.5
+
+# Numeric metadata may drift by this much, relative or absolute
+METADATA_REL_TOLERANCE = 0.02
+METADATA_ABS_TOLERANCE = 0.05
+
+
+def _gradient(width: int, height: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    rows = np.linspace(0, 1, height, dtype=np.float32)[:, None, None]
+    sky = np.array([220, 180, 140], dtype=np.float32)
+    ground = np.array([50, 100, 70], dtype=np.float32)
+    image = (sky * (1 - rows) + ground * rows).repeat(width, axis=1)
+    return np.clip(image + rng.normal(0, 5, image.shape), 0, 255).astype(np.uint8)
+
+
+def _tilted_horizon() -> np.ndarray:
+    image = _gradient(1600, 1200, seed=11)
+    dy = int(np.tan(np.radians(5)) * 1600)
+    cv2.line(image, (0, 600), (1600, 600 + dy), (30, 30, 30), 6)
+    return image
+
+
+def _centered_subject() -> np.ndarray:
+    image = _gradient(1200, 900, seed=12)
+    cv2.circle(image, (600, 450), 120, (30, 60, 200), -1)
+    return image
+
+
+def _texture() -> np.ndarray:
+    rng = np.random.default_rng(13)
+    tiles = (rng.random((60, 80)) > 0.5).astype(np.uint8) * 200 + 25
+    image = cv2.resize(tiles, (1280, 960), interpolation=cv2.INTER_NEAREST)
+    return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+
+
+def _flat() -> np.ndarray:
+    rng = np.random.default_rng(14)
+    return np.clip(rng.normal(128, 4, (768, 1024, 3)), 0, 255).astype(np.uint8)
+
+
+def corpus():
+    """
+    Yield (name, image, subject box or None) for the fixed corpus
+
+    Everything is generated from fixed seeds; no files are read.
+    """
+    base = synthetic_image(1024, 768)
+    yield "base_1024", base, None
+    yield "base_4032", synthetic_image(4032, 3024), None
+    yield "vertical_768x1024", synthetic_image(768, 1024, seed=1), None
+    yield "small_320", synthetic_image(320, 240, seed=2), None
+    yield "tilted_horizon", _tilted_horizon(), None
+    yield "centered_subject", _centered_subject(), None
+    yield "blurred", cv2.GaussianBlur(base, (0, 0), 4), None
+    yield "overexposed", cv2.add(base, np.full_like(base, 90)), None
+    yield "underexposed", (base * 0.2).astype(np.uint8), None
+    yield "low_contrast", (base * 0.2 + 100).astype(np.uint8), None
+    yield "texture", _texture(), None
+    yield "flat", _flat(), None
+    # The subject disc of synthetic_image sits at (w/3, h/3) with radius min(w, h)/10
+    yield "subject_box", synthetic_image(2048, 1536, seed=3), "530,358,300,300"
+    yield "subject_detect", _centered_subject(), "detect"
+
+
+def _subject(spec):
+    if spec is None:
+        return None
+    if spec == "detect":
+        return SubjectSpec(detect=True)
+    return SubjectSpec(box=spec)
+
+
+def measure(image: np.ndarray, subject, rounds: int):
+    """Analyze one corpus image for every genre; returns its golden entry"""
+    entry = {"size": [image.shape[1], image.shape[0]], "totals": {}, "rules": {}}
+    for genre in GENRES:
+        result = CompositionAnalyzer(genre).analyze_image(image, subject=_subject(subject))
+        entry["totals"][genre] = result["total_score"]
+        if genre == "portrait":
+            scores = {rule["name"]: rule["score"] for rule in result["rules"]}
+            for rule, metadata in result["metadata"]["raw_results"].items():
+                entry["rules"][rule] = {"score": scores[RULES[rule].display_name], "metadata": metadata}
+
+    # Timings: median over rounds, per rule and for the whole analysis
+    analyzer = CompositionAnalyzer("portrait")
+    samples = {}
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = analyzer.analyze_image(image, subject=_subject(subject))
+        samples.setdefault("total", []).append((time.perf_counter() - start) * 1000)
+        for name in RULES:
+            if name in result["metadata"]["timings_ms"]:
+                samples.setdefault(name, []).append(result["metadata"]["timings_ms"][name])
+    entry["timings_ms"] = {name: round(statistics.median(values), 2) for name, values in samples.items()}
+    return json.loads(json.dumps(entry, default=float))
+
+
+def host_info():
+    return {
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__
+    }
+
+
+def diff_values(expected, actual, path: str):
+    """Yield descriptions of metadata values outside tolerance"""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        for key in sorted(set(expected) | set(actual)):
+            if key not in expected or key not in actual:
+                yield f"{path}.{key}: {'added' if key in actual else 'missing'}"
+            else:
+                yield from diff_values(expected[key], actual[key], f"{path}.{key}")
+    elif isinstance(expected, list) and isinstance(actual, list):
+        if len(expected) != len(actual):
+            yield f"{path}: length {len(expected)} -> {len(actual)}"
+        else:
+            for i, (e, a) in enumerate(zip(expected, actual)):
+                yield from diff_values(e, a, f"{path}[{i}]")
+    elif isinstance(expected, (int, float)) and isinstance(actual, (int, float)) \
+            and not isinstance(expected, bool):
+        allowed = max(METADATA_ABS_TOLERANCE, METADATA_REL_TOLERANCE * abs(expected))
+        if abs(expected - actual) > allowed:
+            yield f"{path}: {expected} -> {actual}"
+    elif expected != actual:
+        yield f"{path}: {expected!r} -> {actual!r}"
+
+
+def compare(name: str, golden: dict, current: dict, time_factor: float):
+    """Returns (accuracy failures, timing failures) for one corpus entry"""
+    failures, slow = [], []
+    for genre, expected in golden["totals"].items():
+        actual = current["totals"].get(genre)
+        if actual is None or abs(actual - expected) > TOTAL_TOLERANCE:
+            failures.append(f"{name} total[{genre}]: {expected} -> {actual}")
+
+    for rule, expected in golden["rules"].items():
+        actual = current["rules"].get(rule)
+        if actual is None:
+            failures.append(f"{name} {rule}: missing")
+            continue
+        tolerance = RULE_TOLERANCES.get(rule, DEFAULT_TOLERANCE)
+        if abs(actual["score"] - expected["score"]) > tolerance:
+            failures.append(f"{name} {rule}.score: {expected['score']} -> {actual['score']} (±{tolerance})")
+        failures.extend(
+            f"{name} {rule}.metadata{d}"
+            for d in diff_values(expected["metadata"], actual["metadata"], "")
+        )
+
+    if time_factor > 0:
+        expected_ms, actual_ms = golden["timings_ms"]["total"], current["timings_ms"]["total"]
+        if actual_ms > expected_ms * time_factor:
+            slow.append(f"{name} total: {expected_ms}ms -> {actual_ms}ms (>{time_factor}x)")
+    return failures, slow
+
+
+def record(args) -> int:
+    cases = {}
+    for name, image, subject in corpus():
+        cases[name] = measure(image, subject, args.rounds)
+        print(f"{name:<20} {cases[name]['totals']} {cases[name]['timings_ms']['total']}ms")
+
+    golden = {"host": host_info(), "rounds": args.rounds, "cases": cases}
+    GOLDEN_PATH.write_text(json.dumps(golden, indent=2, sort_keys=True) + "\n")
+    print(f"Recorded {len(cases)} cases to {GOLDEN_PATH}")
+    return 0
+
+
+def check(args) -> int:
+    golden = json.loads(GOLDEN_PATH.read_text())
+    same_host = golden["host"] == host_info()
+    if not same_host:
+        print("Golden timings were recorded on a different host or library versions; "
+              "timing regressions are reported but do not fail the check")
+
+    failures, slow = [], []
+    seen = set()
+    for name, image, subject in corpus():
+        if args.case and name not in args.case:
+            continue
+        seen.add(name)
+        if name not in golden["cases"]:
+            failures.append(f"{name}: not in golden output (re-record)")
+            continue
+        current = measure(image, subject, golden["rounds"])
+        case_failures, case_slow = compare(name, golden["cases"][name], current, args.time_factor)
+        failures += case_failures
+        slow += case_slow
+        status = "FAIL" if case_failures else ("SLOW" if case_slow else "ok")
+        print(f"{name:<20} {status:<5} {current['timings_ms']['total']:>8.1f}ms "
+              f"(golden {golden['cases'][name]['timings_ms']['total']}ms)")
+
+    for line in failures:
+        print(f"  drift: {line}")
+    for line in slow:
+        print(f"  slow:  {line}")
+    print(f"{len(seen)} cases, {len(failures)} drifted values, {len(slow)} slow timings")
+
+    if failures or (slow and same_host):
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    check_cmd = commands.add_parser("check", help="Compare against the golden output")
+    check_cmd.add_argument("--time-factor", type=float, default=0,
+                           help="Fail when a case's total time exceeds golden x this "
+                                "(default 0: timings are reported only)")
+    check_cmd.add_argument("--case", action="append", help="Only check this case (repeatable)")
+    check_cmd.set_defaults(func=check)
+
+    record_cmd = commands.add_parser("record", help="Re-record the golden output")
+    record_cmd.add_argument("--rounds", type=int, default=5, help="Timed runs per case")
+    record_cmd.set_defaults(func=record)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
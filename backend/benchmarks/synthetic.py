@@ -0,0 +1,32 @@
+"""
+Frozen copy of the warm-up's synthetic image generator
+
+The golden corpus and the memory benchmark are generated from this copy
+rather than app.core.warmup.synthetic_image, so tuning the warm-up image
+never silently changes the benchmark inputs. Do not edit: any change to
+the output means re-recording benchmarks/golden.json.
+"""
+import cv2
+import numpy as np
+
+
+def synthetic_image(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """
+    Deterministic photo-like BGR test image
+
+    A sky/ground gradient split by a slightly tilted horizon, a subject
+    disc near a thirds power point and mild sensor-like noise, so every
+    rule exercises its real code path.
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.linspace(0, 1, height, dtype=np.float32)[:, None, None]
+    sky = np.array([230, 190, 150], dtype=np.float32)
+    ground = np.array([60, 110, 80], dtype=np.float32)
+    image = (sky * (1 - rows) + ground * rows).repeat(width, axis=1).astype(np.uint8)
+
+    horizon_y = int(height * 0.55)
+    cv2.line(image, (0, horizon_y), (width, horizon_y + height // 60), (40, 40, 40), max(2, height // 300))
+    cv2.circle(image, (width // 3, height // 3), min(width, height) // 10, (30, 60, 200), -1)
+
+    noise = rng.normal(0, 6, image.shape).astype(np.int16)
+    return np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
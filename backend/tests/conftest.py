@@ -0,0 +1,15 @@
+import os
+import tempfile
+
+# Settings are read when the app is first imported: no API calls, no
+# background warm-up or history writer, and scratch upload directories
+_scratch = tempfile.mkdtemp(prefix="photo-guide-tests-")
+os.environ.update({
+    "GEMINI_BACKEND": "fake",
+    "WARMUP_ENABLED": "false",
+    "PRELOAD_MODULES": "false",
+    "HISTORY_ENABLED": "false",
+    "ADMISSION_ENABLED": "false",
+    "UPLOAD_DIR": os.path.join(_scratch, "uploads"),
+    "OUTPUT_DIR": os.path.join(_scratch, "outputs")
+})
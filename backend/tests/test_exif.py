@@ -0,0 +1,46 @@
+import struct
+
+import cv2
+import numpy as np
+
+from app.core.composition import exif as exif_module
+from benchmarks.synthetic import synthetic_image
+
+
+def exif_jpeg(image: np.ndarray, orientation: int) -> bytes:
+    """JPEG with a minimal Exif APP1 (orientation only) right after SOI"""
+    ok, encoded = cv2.imencode(".jpg", image)
+    assert ok
+    # Little-endian TIFF: header, one IFD0 entry (SHORT orientation), no next IFD
+    tiff = b"II*\x00" + struct.pack("<I", 8) + struct.pack("<H", 1) \
+        + struct.pack("<HHIHH", 0x0112, 3, 1, orientation, 0) + struct.pack("<I", 0)
+    payload = b"Exif\x00\x00" + tiff
+    app1 = b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload
+    data = encoded.tobytes()
+    return data[:2] + app1 + data[2:]
+
+
+def test_read_exif_reads_only_the_header(tmp_path, monkeypatch):
+    path = tmp_path / "exif.jpg"
+    path.write_bytes(exif_jpeg(synthetic_image(4032, 3024), orientation=6))
+    reads = []
+    real_open = open
+
+    def counting_open(file, mode="r", *args, **kwargs):
+        f = real_open(file, mode, *args, **kwargs)
+        read = f.read
+        f.read = lambda *a: reads.append(a) or read(*a)
+        return f
+
+    monkeypatch.setattr(exif_module, "open", counting_open, raising=False)
+    exif = exif_module.read_exif(str(path))
+
+    assert exif["orientation"] == 6
+    # One bounded header read, not a pass over the whole file
+    assert len(reads) == 1
+    assert reads[0] == (exif_module.HEADER_READ_SIZE,)
+
+
+def test_parse_exif_without_app1():
+    ok, encoded = cv2.imencode(".jpg", synthetic_image(320, 240))
+    assert exif_module.parse_exif(encoded.tobytes()) == {}
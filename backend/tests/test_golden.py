@@ -0,0 +1,11 @@
+import argparse
+
+from benchmarks import golden
+
+
+def test_scores_match_the_golden_output(capsys):
+    # Accuracy only: timings depend on the host and are checked on request
+    # with `python -m benchmarks.golden check --time-factor N`
+    status = golden.check(argparse.Namespace(time_factor=0, case=None))
+    report = capsys.readouterr().out
+    assert status == 0, report
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from fastapi.testclient import TestClient
+
+from app.api import generate
+from app.core.config import settings
+from app.main import app
+from app.services.gemini_client import FakeGeminiClient
+from app.services.job_queue import JobQueue
+
+JOBS_URL = f"{settings.api_prefix}/generate-nanobanana/jobs"
+
+
+def run_until_done(jobs: JobQueue, submitted, timeout: float = 5.0):
+    """Start `jobs`, submit via `submitted(jobs)` and wait for every job to finish"""
+    async def main():
+        await jobs.start()
+        pending = submitted(jobs)
+        deadline = time.monotonic() + timeout
+        while not all(job.done for job in pending) and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        await jobs.stop()
+        return pending
+
+    return asyncio.run(main())
+
+
+def test_higher_priority_runs_first():
+    order = []
+
+    async def handler(payload):
+        order.append(payload["name"])
+        return await FakeGeminiClient(latency=0).generate_image("unused.jpg", payload["name"])
+
+    # One worker, and every job is queued before it gets to run
+    jobs = run_until_done(JobQueue(handler, workers=1, max_depth=10), lambda queue: [
+        queue.submit({"name": name}, priority=priority)
+        for name, priority in [("low", 0), ("high", 9), ("mid", 5), ("high_later", 9)]
+    ])
+
+    assert order == ["high", "high_later", "mid", "low"]
+    assert all(job.status == "succeeded" for job in jobs)
+    assert jobs[0].result["suggestions"].startswith("[fake]")
+
+
+def test_hung_job_times_out_and_frees_its_worker():
+    async def handler(payload):
+        if payload["hang"]:
+            await asyncio.sleep(60)
+        return await FakeGeminiClient(latency=0).generate_image("unused.jpg", "ok")
+
+    queue = JobQueue(handler, workers=1, max_depth=10, timeout=0.2)
+    hung, ok = run_until_done(queue, lambda q: [q.submit({"hang": True}), q.submit({"hang": False})])
+
+    assert hung.status == "failed"
+    assert "Timed out" in hung.error
+    assert ok.status == "succeeded"
+    assert queue.metrics()["timed_out"] == 1
+
+
+@contextmanager
+def api(monkeypatch, **queue_options):
+    """Test client with a fresh generation queue, started by the app's startup"""
+    queue = JobQueue(generate._generation_job_handler, **{"workers": 2, "max_depth": 10, **queue_options})
+    monkeypatch.setattr(generate, "generation_jobs", queue)
+    with TestClient(app) as client:
+        yield client
+
+
+def submit(client: TestClient, **form):
+    return client.post(
+        JOBS_URL,
+        files={"file": ("photo.jpg", b"\xff\xd8 not decoded by the fake backend", "image/jpeg")},
+        data={"prompt": "brighten the sky", **form}
+    )
+
+
+def poll(client: TestClient, job_id: str, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"{JOBS_URL}/{job_id}").json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_submit_and_poll(monkeypatch):
+    with api(monkeypatch) as client:
+        response = submit(client, style="vivid")
+        assert response.status_code == 202
+        submitted = response.json()
+        assert submitted["status_url"].endswith(submitted["job_id"])
+        job = poll(client, submitted["job_id"])
+        missing = client.get(f"{JOBS_URL}/does-not-exist")
+
+    assert job["status"] == "succeeded"
+    assert job["result"]["metadata"]["style"] == "vivid"
+    assert job["result"]["metadata"]["suggestions"].startswith("[fake]")
+    assert missing.status_code == 404
+
+
+def test_full_queue_returns_429(monkeypatch):
+    monkeypatch.setattr(settings, "fake_gemini_latency", 1.0)
+    with api(monkeypatch, workers=1, max_depth=1) as client:
+        # At most one job running and one queued, so the third is always rejected
+        responses = [submit(client) for _ in range(3)]
+
+    assert responses[0].status_code == 202
+    assert responses[-1].status_code == 429
+    assert responses[-1].headers["Retry-After"]
+
+
+def test_webhook_receives_finished_job(monkeypatch):
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.handle_request, daemon=True).start()
+    try:
+        with api(monkeypatch) as client:
+            response = submit(client, callback_url=f"http://127.0.0.1:{server.server_port}/done")
+            assert response.status_code == 202
+            deadline = time.monotonic() + 5
+            while not received and time.monotonic() < deadline:
+                time.sleep(0.02)
+            disallowed = submit(client, callback_url="http://example.com/hook")
+    finally:
+        server.server_close()
+
+    assert received and received[0]["job_id"] == response.json()["job_id"]
+    assert received[0]["status"] == "succeeded"
+    assert disallowed.status_code == 400
@@ -0,0 +1,39 @@
+import cv2
+import numpy as np
+import pytest
+
+from app.core.composition.analyzer import CompositionAnalyzer
+from app.core.composition.registry import RULES, laplacian_stats
+from app.core.composition.roi import SubjectSpec
+from app.core.config import settings
+
+# Subject crops of uniformly detailed content differ only by content variance
+SUBJECT_SHARPNESS_TOLERANCE = 3.0
+
+
+def sharpness_score(image: np.ndarray, subject=None) -> float:
+    result = CompositionAnalyzer("portrait").analyze_image(image, subject=subject)
+    return next(rule["score"] for rule in result["rules"] if rule["name"] == RULES["sharpness"].display_name)
+
+
+@pytest.mark.parametrize("box", ["0.3,0.3,0.4,0.4", "0.425,0.425,0.15,0.15"])
+def test_subject_sharpness_matches_the_whole_frame(box):
+    # Uniform detail scores the same whether analyzed whole or through a subject box
+    rng = np.random.default_rng(15)
+    image = cv2.GaussianBlur(rng.integers(0, 256, (600, 800, 3), dtype=np.uint8), (0, 0), 1.2)
+
+    full = sharpness_score(image)
+    assert sharpness_score(image, SubjectSpec(box=box)) == pytest.approx(full, abs=SUBJECT_SHARPNESS_TOLERANCE)
+
+
+@pytest.mark.parametrize("rows", [1, 7, 256])
+def test_strip_laplacian_matches_the_whole_image(rows, monkeypatch):
+    rng = np.random.default_rng(16)
+    gray = rng.integers(0, 256, (333, 250), dtype=np.uint8)
+    expected = cv2.Laplacian(gray, cv2.CV_64F).var()
+
+    monkeypatch.setattr(settings, "laplacian_strip_rows", rows)
+    variance, shape = laplacian_stats(gray)
+
+    assert variance == pytest.approx(expected, rel=1e-9)
+    assert shape == gray.shape